@@ -0,0 +1,143 @@
+# Dependencies
+import io
+import os
+import shutil
+import tempfile
+import pandas as pd
+from Agata_Retail_Clean_Data import Clean_Data
+
+# Constants
+_appended_suffix = '.appended'
+
+def check_dialect(file_path, raw_export):
+    """
+        Raises ValueError when the file is not in the dialect of the data
+        i.e. a raw export (semi-colon delimited) added to converted data or the other way round
+    """
+    delimiter, decimal = Clean_Data().sniff_dialect(file_path)
+    expected = Clean_Data._source_delimiter if raw_export else Clean_Data._target_delimiter
+    if delimiter != expected:
+        advice = 'read the data with --raw' if delimiter == Clean_Data._source_delimiter else 'add the raw export'
+        raise ValueError(f"{file_path} is delimited by '{delimiter}' but the data by '{expected}', run Agata_Retail_Clean_Data.py on it or {advice}")
+
+def get_header(file_path, read_options):
+    """
+        Returns the column names of a csv file, only its first line is read
+    """
+    with open(file_path, mode = 'rb') as csv_file:
+        header = csv_file.readline().decode(read_options.get('encoding', 'utf-8'), errors = 'replace')
+    return list(pd.read_csv(io.StringIO(header), nrows = 0, sep = read_options.get('sep', ',')).columns)
+
+def check_columns(file_path, read_options, expected_columns, exact = False):
+    """
+        Raises ValueError when the file misses one of the expected columns,
+        or with exact, when its columns are not the expected columns in the same order
+    """
+    columns = get_header(file_path, read_options)
+    missing = [column for column in expected_columns if column not in columns]
+    if missing:
+        raise ValueError(f'{file_path} has no column {", ".join(missing)}')
+    if exact and columns != list(expected_columns):
+        raise ValueError(f'{file_path} has the columns {", ".join(columns)} instead of {", ".join(expected_columns)}')
+
+def check_new_dates(file_path, new_dates, existing_dates):
+    """
+        Raises ValueError when a date of the new rows is already in the data i.e. the file was added before
+    """
+    new_dates = pd.DatetimeIndex(new_dates).unique()
+    overlap = new_dates[new_dates.isin(existing_dates)]
+    if len(overlap):
+        raise ValueError(f'{file_path} has {len(overlap)} days already in the data e.g. {", ".join(overlap[:5].strftime("%Y-%m-%d"))}')
+
+def get_appended_path(file_path):
+    """
+        Returns the csv file the rows of new exports are added to, next to the data file
+        e.g. SELL_1.appended.csv for SELL_1.csv, the data file itself is never written to
+    """
+    root, extension = os.path.splitext(file_path)
+    return f'{root}{_appended_suffix}{extension}'
+
+def get_source_paths(file_path):
+    """
+        Returns the csv files of the data i.e. the data file and its appended rows when there are any
+    """
+    appended_path = get_appended_path(file_path)
+    return [file_path, appended_path] if os.path.exists(appended_path) else [file_path]
+
+def concat_frames(frames, ignore_index = False):
+    """
+        Returns the frames one after the other as one DataFrame e.g. the data and its appended rows
+        Columns categorical in the first frame stay categorical: its categories first, then the new ones of the next frames,
+        the same categories as adding the rows of the next frames in memory
+    """
+    if len(frames) == 1:
+        return frames[0]
+    frames = [frame.copy(deep = False) for frame in frames]
+    for column, dtype in frames[0].dtypes.items():
+        if not isinstance(dtype, pd.CategoricalDtype):
+            continue
+        categories = dtype.categories
+        for frame in frames[1:]:
+            values = frame[column].cat.categories if isinstance(frame[column].dtype, pd.CategoricalDtype) else pd.Index(frame[column].dropna().unique())
+            categories = categories.append(values.difference(categories))
+        for frame in frames:
+            frame[column] = frame[column].astype(pd.CategoricalDtype(categories))
+    return pd.concat(frames, ignore_index = ignore_index)
+
+def read_csv_files(file_path, **read_options):
+    """
+        Returns the data file and its appended rows as one DataFrame
+        Columns that are categorical in the data file stay categorical across the files
+    """
+    return concat_frames([pd.read_csv(path, **read_options) for path in get_source_paths(file_path)], ignore_index = True)
+
+def append_rows(data_path, file_path, delimiter = ','):
+    """
+        Adds the rows of file_path (every line but the header and the totals rows) to the appended rows of data_path
+        The data file is left untouched, deleting the appended file restores the data as exported
+        The rows are written at the end of the appended file (O_APPEND) and synced, the previous rows are not read or written again,
+        a failed write is truncated away so the file never keeps a partial row
+        The appended file is created through a temporary file with the permissions of the data file
+        Returns the number of bytes appended
+    """
+    with open(file_path, mode = 'rb') as source:
+        header = source.readline()
+        # Totals rows of the exports have no date
+        rows = b''.join(line for line in source if line.strip() and line.split(delimiter.encode(), 1)[0].strip())
+    if not rows:
+        return 0
+
+    appended_path = get_appended_path(data_path)
+    new_line = b'\r\n' if header.endswith(b'\r\n') else b'\n'
+    if not rows.endswith(b'\n'):
+        rows += new_line
+
+    if not os.path.exists(appended_path):
+        temp_descriptor, temp_path = tempfile.mkstemp(prefix = '.', suffix = '.tmp', dir = os.path.dirname(os.path.abspath(appended_path)))
+        try:
+            with os.fdopen(temp_descriptor, mode = 'wb') as target:
+                target.write(header if header.endswith(b'\n') else header + new_line)
+                target.write(rows)
+                target.flush()
+                os.fsync(target.fileno())
+            shutil.copymode(data_path, temp_path)
+            os.replace(temp_path, appended_path)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+        return len(rows)
+
+    descriptor = os.open(appended_path, os.O_WRONLY | os.O_APPEND)
+    try:
+        previous_size = os.fstat(descriptor).st_size
+        try:
+            written = 0
+            while written < len(rows):
+                written += os.write(descriptor, rows[written:])
+            os.fsync(descriptor)
+        except BaseException:
+            os.ftruncate(descriptor, previous_size)
+            raise
+    finally:
+        os.close(descriptor)
+    return len(rows)
@@ -0,0 +1,121 @@
+# Dependencies
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+import numpy as np
+import pandas as pd
+from Agata_Date_Index import Date_Index, get_date_bounds
+
+# Constants
+_repeat = 5
+_entry_points = ['Agata_Day_Sell', 'Agata_Product_Sales']
+
+_range_years = 10
+_rows_per_day = 500
+_range_queries = 200
+
+# Libraries the entry points used to import at start up, now imported on first use
+_deferred_modules = ['seaborn', 'matplotlib.pyplot', 'sklearn.linear_model', 'sklearn.model_selection']
+
+def time_statement(statement, repeat = _repeat):
+    """
+        Returns the median wall time in seconds of running the statement in a new interpreter
+    """
+    timings = []
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        subprocess.run([sys.executable, '-c', statement], check = True, cwd = os.path.dirname(os.path.abspath(__file__)))
+        timings.append(time.perf_counter() - start_time)
+    return statistics.median(timings)
+
+def benchmark_startup(repeat = _repeat):
+    """
+        Prints the start up time of every entry point with the deferred imports,
+        and with the plotting and scikit-learn libraries imported eagerly as before
+    """
+    interpreter = time_statement('pass', repeat)
+    print(f'Interpreter start up: {interpreter * 1000:.0f} ms (median of {repeat})')
+    print(f'{"Entry point":<24}{"Deferred":>12}{"Eager":>12}{"Speed up":>10}')
+    for entry_point in _entry_points:
+        deferred = time_statement(f'import {entry_point}', repeat)
+        eager = time_statement(f'import {entry_point}, {", ".join(_deferred_modules)}', repeat)
+        print(f'{entry_point:<24}{deferred * 1000:>9.0f} ms{eager * 1000:>9.0f} ms{eager / deferred:>9.1f}x')
+
+def get_multi_year_rows(years = _range_years, rows_per_day = _rows_per_day):
+    """
+        Returns synthetic row level sales of many years, rows_per_day rows for every day, sorted by date
+    """
+    dates = pd.date_range('2010-01-01', periods = years * 365, freq = 'D', name = 'Date')
+    random_state = np.random.RandomState(0)
+    return pd.DataFrame({'Net Sale Value': random_state.random_sample(len(dates) * rows_per_day).astype('float32')}, index = dates.repeat(rows_per_day))
+
+def time_queries(query, ranges, repeat):
+    """
+        Returns the median wall time in seconds of one query, over repeat runs of all the ranges
+    """
+    timings = []
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        for from_date, to_date in ranges:
+            query(from_date, to_date)
+        timings.append((time.perf_counter() - start_time) / len(ranges))
+    return statistics.median(timings)
+
+def benchmark_range_query(repeat = _repeat):
+    """
+        Prints the latency of date range queries on multi-year row level data
+        with a boolean mask (the only option on an unsorted index), DataFrame.loc on the sorted index,
+        the binary search slices of Date_Index and its month offset table
+    """
+    data = get_multi_year_rows()
+    start_time = time.perf_counter()
+    date_index = Date_Index(data.index)
+    build_seconds = time.perf_counter() - start_time
+    print(f'{len(data):,} rows over {_range_years} years, date index built in {build_seconds * 1000:.0f} ms')
+
+    # Random ranges of 1 to 90 days, and whole months
+    random_state = np.random.RandomState(1)
+    days = data.index.unique()
+    starts = random_state.randint(0, len(days) - 90, _range_queries)
+    ranges = [(days[start].strftime('%Y-%m-%d'), days[start + length].strftime('%Y-%m-%d')) for start, length in zip(starts, random_state.randint(0, 90, _range_queries))]
+    months = [month.strftime('%Y-%m') for month in date_index.month_offsets.index[random_state.randint(0, len(date_index.month_offsets), _range_queries)]]
+
+    def mask_query(from_date, to_date):
+        start, end = get_date_bounds(from_date, to_date)
+        return data[(data.index >= start) & (data.index <= end)]
+
+    queries = [
+        ('Boolean mask', mask_query, ranges),
+        ('DataFrame.loc', lambda from_date, to_date: data.loc[from_date:to_date], ranges),
+        ('Date_Index', lambda from_date, to_date: data.iloc[date_index.get_slice(from_date, to_date)], ranges),
+        ('Month offsets', lambda month, _: data.iloc[date_index.get_month_slice(month)], [(month, None) for month in months]),
+    ]
+    print(f'{"Query":<16}{"Latency":>14}')
+    for name, query, query_ranges in queries:
+        print(f'{name:<16}{time_queries(query, query_ranges, repeat) * 1e6:>11.0f} us')
+
+# Benchmarks i.e. name: function
+_benchmarks = {
+    'startup': benchmark_startup,
+    'range-query': benchmark_range_query,
+}
+
+def main():
+    parser = argparse.ArgumentParser(description='Agata Retail Analysis Benchmarks')
+    parser.add_argument('benchmarks', nargs='*', help=f'Benchmarks to run ({", ".join(_benchmarks)}), all if omitted')
+    parser.add_argument('--repeat', type=int, default=_repeat, help='Number of runs of every measurement')
+    args = parser.parse_args()
+    unknown = set(args.benchmarks) - set(_benchmarks)
+    if unknown:
+        parser.error(f'unknown benchmarks: {", ".join(sorted(unknown))}')
+    for name in args.benchmarks or _benchmarks:
+        print('-' * 30)
+        print(name)
+        print('-' * 30)
+        _benchmarks[name](args.repeat)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,267 @@
+# Dependencies
+import hashlib
+import os
+import pickle
+import re
+import tempfile
+import pandas as pd
+
+def get_file_mode():
+    """
+        Returns the permissions of a new file under the umask of the process e.g. 0o644
+        Read once at import, as the umask can only be read by setting it
+    """
+    umask = os.umask(0)
+    os.umask(umask)
+    return 0o666 & ~umask
+
+class Data_Cache(object):
+
+    # Constants
+    _cache_directory = '.agata_cache'
+    _sample_size = 64 * 1024
+    _parquet_suffix = '.parquet'
+    _pickle_suffix = '.pkl'
+    _max_parts = 64
+    _file_mode = get_file_mode()
+
+    # Tag with a version e.g. aggregates-v2-clean i.e. (name, version, variant)
+    _tag_pattern = re.compile(r'^(.+)-v(\d+)(.*)$')
+
+    # Cache entry name after the prefix and fingerprint i.e. appended bytes covered and modification time of the appended file
+    # <end>-<modified> for the entry of the source, <start>-<end>-<modified> for a part of rows appended later
+    _entry_pattern = re.compile(r'^(?:(\d+)-)?(\d+)-(\d+)(\.\w+)$')
+
+    def __init__(self, source_path, tag, appended_path = None):
+        """
+            Class Initialization
+            :source_path: csv file the cached data is prepared from
+            :tag: name of the prepared data, should change whenever the preparation steps change
+                  e.g. aggregates-v2-clean, entries of the older versions (aggregates-v1-clean) are removed when storing
+            :appended_path: csv file of rows added to the source later, its rows are cached as parts following the entry of the source
+        """
+        self.source_path = source_path
+        self.tag = tag
+        self.appended_path = appended_path
+        self.cache_directory = os.path.join(os.path.dirname(os.path.abspath(source_path)), self._cache_directory)
+
+    def fingerprint(self):
+        """
+            Returns a short hash of the source file size, modification time and
+            the first and last bytes of its content
+            Only a small sample is read so the check stays cheap on multi-GB files
+            The appended file is not part of it, the entries name the appended bytes they cover instead
+        """
+        digest = hashlib.sha256()
+        digest.update(self.tag.encode())
+        self.update_digest(digest, self.source_path)
+        return digest.hexdigest()[:16]
+
+    def update_digest(self, digest, file_path):
+        """
+            Adds the size, modification time and the first and last bytes of a file to the digest
+        """
+        stat = os.stat(file_path)
+        digest.update(f'|{stat.st_size}|{stat.st_mtime_ns}'.encode())
+        with open(file_path, mode='rb') as source:
+            digest.update(source.read(self._sample_size))
+            if stat.st_size > 2 * self._sample_size:
+                source.seek(-self._sample_size, os.SEEK_END)
+                digest.update(source.read(self._sample_size))
+
+    def get_appended_state(self):
+        """
+            Returns a tuple (size, modification time in ns) of the appended file, (0, 0) when there is none
+        """
+        if self.appended_path is None or not os.path.exists(self.appended_path):
+            return (0, 0)
+        stat = os.stat(self.appended_path)
+        return (stat.st_size, stat.st_mtime_ns)
+
+    def get_prefix(self):
+        """
+            Returns the file name prefix shared by all cache entries of this source and tag
+        """
+        return f'{os.path.basename(self.source_path)}.{self.tag}.'
+
+    def get_cache_path(self, fingerprint, start, end, modified, suffix):
+        """
+            Returns the path of the cache entry for the given fingerprint covering the appended bytes up to end,
+            from start for a part (start None for the entry of the source)
+        """
+        covered = f'{end}-{modified}' if start is None else f'{start}-{end}-{modified}'
+        return os.path.join(self.cache_directory, f'{self.get_prefix()}{fingerprint}.{covered}{suffix}')
+
+    def get_chain(self, fingerprint, size, modified = None):
+        """
+            Returns the paths of the entry of the source and of the parts that follow it up to size bytes of the appended file,
+            or None when they do not reach it or, if given, the last one was not written at the modification time
+        """
+        if not os.path.isdir(self.cache_directory):
+            return None
+        prefix = f'{self.get_prefix()}{fingerprint}.'
+        source_entry = None
+        parts = {}
+        for file_name in os.listdir(self.cache_directory):
+            match = self._entry_pattern.match(file_name[len(prefix):]) if file_name.startswith(prefix) else None
+            if match is None or int(match.group(2)) > size:
+                continue
+            entry = (int(match.group(2)), int(match.group(3)), os.path.join(self.cache_directory, file_name))
+            if match.group(1) is not None:
+                parts[int(match.group(1))] = entry
+            elif source_entry is None or entry[0] > source_entry[0]:
+                source_entry = entry
+        if source_entry is None:
+            return None
+
+        # Walk from the entry of the source along the parts
+        position, last_modified, path = source_entry
+        chain = [path]
+        while position < size and position in parts:
+            position, last_modified, path = parts[position]
+            chain.append(path)
+        if position != size or (modified is not None and last_modified != modified):
+            return None
+        return chain
+
+    def read_entry(self, path):
+        """
+            Returns the DataFrame of a cache entry
+        """
+        if path.endswith(self._parquet_suffix):
+            return pd.read_parquet(path)
+        return pd.read_pickle(path)
+
+    def load_frame(self, merge = None):
+        """
+            Returns the cached DataFrame, or None when the source changed or nothing is cached
+            :merge: function merging the entry of the source and the parts of the appended rows (list of DataFrames in order) into one,
+                    without it the cache is only used when nothing was appended since the entry was stored
+            Once there are more than _max_parts parts they are merged into one entry
+        """
+        try:
+            fingerprint = self.fingerprint()
+            chain = self.get_chain(fingerprint, *self.get_appended_state())
+            if chain is None or (len(chain) > 1 and merge is None):
+                return None
+            frame = self.read_entry(chain[0]) if len(chain) == 1 else merge([self.read_entry(path) for path in chain])
+            if len(chain) > self._max_parts + 1:
+                self.store_frame(frame)
+            return frame
+        except (OSError, ImportError, ValueError):
+            pass
+        return None
+
+    def load_object(self):
+        """
+            Returns the cached object, or None when the source or the appended file changed or nothing is cached
+        """
+        try:
+            chain = self.get_chain(self.fingerprint(), *self.get_appended_state())
+            if chain is not None and len(chain) == 1 and chain[0].endswith(self._pickle_suffix):
+                with open(chain[0], mode='rb') as cache_file:
+                    return pickle.load(cache_file)
+        except (OSError, ImportError, AttributeError, EOFError, pickle.UnpicklingError):
+            pass
+        return None
+
+    def get_frame_writer(self, frame):
+        """
+            Returns a function writing the DataFrame in Parquet format (pickle if no Parquet engine is installed)
+        """
+        def write_frame(temp_path):
+            try:
+                frame.to_parquet(temp_path)
+                return self._parquet_suffix
+            except ImportError:
+                frame.to_pickle(temp_path)
+                return self._pickle_suffix
+        return write_frame
+
+    def store_frame(self, frame):
+        """
+            Stores the DataFrame in Parquet format (pickle if no Parquet engine is installed)
+            as the data of the source and of the whole appended file
+            Stale entries of the same source and tag are removed
+
+            Returns a boolean value
+                True: Data cached successfully
+                False: Data could not be cached, e.g. read-only directory
+        """
+        return self.store_entry(self.get_frame_writer(frame))
+
+    def store_part(self, frame, start):
+        """
+            Stores the DataFrame of the rows appended from byte start of the appended file to its end,
+            next to the entries of the data before them i.e. only the new rows are written
+            Returns False, storing nothing, when the entries do not reach start e.g. the data was never cached
+        """
+        try:
+            fingerprint = self.fingerprint()
+            size, modified = self.get_appended_state()
+            if size <= start or self.get_chain(fingerprint, start) is None:
+                return False
+            return self.store_entry(self.get_frame_writer(frame), start)
+        except OSError:
+            return False
+
+    def store_object(self, value):
+        """
+            Stores any picklable object e.g. trained models
+            Returns a boolean value, see store_frame
+        """
+        def write_object(temp_path):
+            with open(temp_path, mode='wb') as cache_file:
+                pickle.dump(value, cache_file, protocol=pickle.HIGHEST_PROTOCOL)
+            return self._pickle_suffix
+        return self.store_entry(write_object)
+
+    def store_entry(self, write_entry, start = None):
+        """
+            Writes a cache entry through a temporary file so readers never see a partial entry
+            :write_entry: function writing to the given path and returning the suffix of the entry
+            :start: first byte of the appended file covered by a part, None for the entry of the source
+                    (which replaces every entry of the source and tag)
+        """
+        try:
+            os.makedirs(self.cache_directory, exist_ok=True)
+            fingerprint = self.fingerprint()
+            size, modified = self.get_appended_state()
+            temp_descriptor, temp_path = tempfile.mkstemp(prefix='.', suffix='.tmp', dir=self.cache_directory)
+            os.close(temp_descriptor)
+            try:
+                suffix = write_entry(temp_path)
+                # mkstemp creates the file readable by its owner only
+                os.chmod(temp_path, self._file_mode)
+                if start is None:
+                    self.remove_entries()
+                os.replace(temp_path, self.get_cache_path(fingerprint, start, size, modified, suffix))
+            finally:
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+            return True
+        except (OSError, ValueError, pickle.PicklingError):
+            return False
+
+    def get_stale_prefixes(self):
+        """
+            Returns the file name prefixes of the entries of this source and tag and of the older versions of the tag
+            e.g. SELL_1.csv.aggregates-v2-clean. and SELL_1.csv.aggregates-v1-clean.
+        """
+        prefixes = [self.get_prefix()]
+        match = self._tag_pattern.match(self.tag)
+        if match is not None:
+            name, version, variant = match.group(1), int(match.group(2)), match.group(3)
+            prefixes.extend(f'{os.path.basename(self.source_path)}.{name}-v{older}{variant}.' for older in range(version))
+        return tuple(prefixes)
+
+    def remove_entries(self):
+        """
+            Removes every cache entry of this source and tag, and the entries of the older versions of the tag
+        """
+        if not os.path.isdir(self.cache_directory):
+            return
+        prefixes = self.get_stale_prefixes()
+        for file_name in os.listdir(self.cache_directory):
+            if file_name.startswith(prefixes):
+                os.remove(os.path.join(self.cache_directory, file_name))
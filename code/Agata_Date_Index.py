@@ -0,0 +1,109 @@
+# Dependencies
+import numpy as np
+import pandas as pd
+
+def get_date_bounds(from_date = None, to_date = None):
+    """
+        Returns the first and last timestamp covered by the dates
+        Partial dates cover the whole period e.g. to_date '2018' ends on 2018-12-31 like DataFrame.loc
+    """
+    start = pd.Period(str(from_date)).start_time if from_date is not None else None
+    end = pd.Period(str(to_date)).end_time if to_date is not None else None
+    return (start, end)
+
+def sort_by_date(frame):
+    """
+        Returns the frame sorted by its DatetimeIndex, unchanged when already sorted
+        The sort is stable so rows of the same date keep their order
+    """
+    if frame.index.is_monotonic_increasing:
+        return frame
+    return frame.sort_index(kind = 'stable')
+
+class Date_Index(object):
+    """
+        Sorted dates of a frame with the row offsets of every month
+        Date ranges are located by binary search and returned as positional slices,
+        so a range query costs O(log rows) whatever the size of the history
+    """
+
+    # Constants
+    _start = 'Start'
+    _stop = 'Stop'
+
+    def __init__(self, index, unique = False):
+        """
+            Class Initialization
+            :index: DatetimeIndex sorted in increasing order, see sort_by_date
+            :unique: True if every date may appear once only i.e. daily data
+            Raises ValueError when the dates are not sorted, missing or (if unique) repeated
+        """
+        self.unique = unique
+        self.check_dates(index)
+        self.dates = index.to_numpy()
+        self.month_offsets = self.build_month_offsets(index)
+
+    def check_dates(self, index):
+        """
+            Raises ValueError when the dates are not sorted, missing or (if unique) repeated
+        """
+        if not isinstance(index, pd.DatetimeIndex):
+            raise ValueError(f'Expected a DatetimeIndex, got {type(index).__name__}')
+        if index.hasnans:
+            raise ValueError(f'{index.isna().sum()} rows have no date')
+        if not index.is_monotonic_increasing:
+            raise ValueError('Dates are not sorted')
+        if self.unique and not index.is_unique:
+            raise ValueError(f'Dates are repeated: {", ".join(index[index.duplicated()].strftime("%Y-%m-%d").unique()[:5])}')
+
+    def build_month_offsets(self, index):
+        """
+            Returns the first row and the row after the last row of every month with data
+            i.e. a DataFrame indexed by month with the columns Start and Stop
+        """
+        months = index.to_period('M')
+        starts = np.flatnonzero(np.r_[True, months[1:] != months[:-1]]) if len(months) else np.array([], dtype = np.int64)
+        stops = np.r_[starts[1:], len(months)].astype(np.int64)
+        return pd.DataFrame({self._start: starts, self._stop: stops}, index = months[starts])
+
+    def extend(self, index):
+        """
+            Adds the dates of rows appended after the indexed rows, the previous dates are not indexed again
+            Raises ValueError when the new dates are invalid or come before the last indexed date
+        """
+        self.check_dates(index)
+        if len(index) == 0:
+            return
+        if len(self.dates) and (index[0] < self.dates[-1] or (self.unique and index[0] == self.dates[-1])):
+            raise ValueError(f'Dates from {index[0]:%Y-%m-%d} do not follow the last date {pd.Timestamp(self.dates[-1]):%Y-%m-%d}')
+
+        # Offsets of the new months follow the previous rows, a month continued from the previous rows is merged
+        month_offsets = self.build_month_offsets(index) + len(self.dates)
+        if len(self.month_offsets) and month_offsets.index[0] == self.month_offsets.index[-1]:
+            self.month_offsets.iloc[-1, self.month_offsets.columns.get_loc(self._stop)] = month_offsets[self._stop].iloc[0]
+            month_offsets = month_offsets.iloc[1:]
+        self.month_offsets = pd.concat([self.month_offsets, month_offsets])
+        self.dates = np.concatenate([self.dates, index.to_numpy()])
+
+    def __len__(self):
+        return len(self.dates)
+
+    def get_slice(self, from_date = None, to_date = None):
+        """
+            Returns the slice of the rows from from_date to to_date, both included
+            Partial dates select whole periods like DataFrame.loc e.g. ('2018-03', '2018-05')
+        """
+        start, end = get_date_bounds(from_date, to_date)
+        first = 0 if start is None else int(np.searchsorted(self.dates, start.to_datetime64(), side = 'left'))
+        last = len(self.dates) if end is None else int(np.searchsorted(self.dates, end.to_datetime64(), side = 'right'))
+        return slice(first, max(first, last))
+
+    def get_month_slice(self, month):
+        """
+            Returns the slice of the rows of a month e.g. '2018-03', empty if the month has no data
+        """
+        month = pd.Period(str(month), freq = 'M')
+        if month not in self.month_offsets.index:
+            return slice(0, 0)
+        offsets = self.month_offsets.loc[month]
+        return slice(int(offsets[self._start]), int(offsets[self._stop]))
@@ -1,11 +1,21 @@
 # Dependencies
+import argparse
+import os
+import sys
+import threading
 from datetime import datetime
 import pandas as pd
-import seaborn as sns
 import numpy as np
-from matplotlib import pyplot as plt
-from sklearn.linear_model import LinearRegression
-from sklearn.model_selection import train_test_split 
+from Agata_Data_Cache import Data_Cache
+from Agata_Date_Index import Date_Index, sort_by_date
+import Agata_Append_Data as append_data
+from Agata_Incremental_Regression import Incremental_Linear_Regression
+import Agata_Forecast as forecasting
+from Agata_Partitioned_Data import Partitioned_Dataset
+import Agata_Partitioned_Data as partitioned_data
+from Agata_Report_Cache import Report_Cache, memoize_report
+import Agata_Report_Api as report_api
+import Agata_Report_Renderer as report_renderer
 
 class DaySell(object):
     all_data = None
@@ -31,34 +41,165 @@ class DaySell(object):
     _net_average_sales_monthly = "Average Net Sales"
     _net_sales_percentage = "Net Sales Percentage"
     _profit_percentage = "Profit Percentage"
-    _data_year = "2018"
     _option_a = "a"
     _option_b = "b"
     _option_c = "c"
     _ordered_day = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
     _day_of_week = 'Day of Week'
-
-    # Variable Constant - Should point to where the file is located in directory
-    _file_path = "..\csv\Day_sell_24_12_18.csv"
-
-    def __init__(self):
+    _raw_separator = ';'
+    _raw_decimal = ','
+    _cache_tag = 'prepared-v1'
+    _model_cache_tag = 'models-v3'
+    _tax_model = 'Tax'
+    _purchase_sale_model = 'Net Purchase and Gross Sale'
+    _dataset = 'day_sell'
+    _source_columns = ['Date', 'zn', 'sb', 'tax', 'marza']
+
+    # Prediction models i.e. name: (features, target)
+    _model_columns = {
+        _tax_model: ([_net_purchase, _gross_sale], _tax),
+        _purchase_sale_model: ([_tax, _margin], [_net_purchase, _gross_sale]),
+    }
+    _measures = [_net_purchase, _gross_sale, _tax, _margin]
+
+    # Reports available without prompting i.e. name: (method, fixed parameters, required parameters)
+    _reports = {
+        'entire-sales': ('summarize_whole_data', {}, ['col_name']),
+        'total-sales': ('summarize_whole_data_sum', {}, ['col_name']),
+        'average-sales': ('summarize_whole_data_average', {}, ['col_name']),
+        'net-sales': ('get_net_sales', {}, []),
+        'net-sales-monthly': ('get_net_sales_monthly', {}, []),
+        'average-net-sales': ('get_average_net_sales_monthly', {}, []),
+        'net-sales-percentage': ('get_net_sales_percentage', {}, []),
+        'date-range': ('display_data_user_choice', {}, ['from_date', 'to_date', 'col_name']),
+        'profit-percentage': ('get_profit_percentage', {}, []),
+        'total-sale-daywise': ('get_total_sales_daywise', {}, []),
+        'average-sale-daywise': ('get_average_sales_daywise', {}, []),
+        'profit-daywise': ('get_profit_daywise', {}, []),
+        'profit-percentage-daywise': ('get_profit_percentage_daywise', {}, []),
+        'predict-tax': ('predict_future_tax', {}, ['net_purchase', 'gross_sale']),
+        'predict-purchase-sales': ('predict_future_purchase_sales', {}, ['tax', 'margin']),
+        'predict-tax-bulk': ('predict_tax_bulk', {}, ['scenarios']),
+        'predict-purchase-sales-bulk': ('predict_purchase_sales_bulk', {}, ['scenarios']),
+        'forecast': ('forecast_sales', {}, ['col_name']),
+        'backtest': ('backtest_forecasts', {}, ['col_name']),
+    }
+
+    # Variable Constant - Default file, another one can be given with data_path
+    _file_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'csv', 'Day_sell_24_12_18.csv')
+
+    def __init__(self, raw_export = False, use_cache = True, report_cache_size = Report_Cache._default_size, bootstrap = False,
+                 data_path = None, partition_root = None, stores = None, load_from = None, load_to = None, data_year = None):
         """
             Class Initialization
+            :raw_export: True to read the original export without running Agata_Retail_Clean_Data.py first
+            :use_cache: False to always prepare the data from the csv file
+            :report_cache_size: Number of report results kept in memory
+            :bootstrap: True to show seaborn's bootstrapped confidence intervals on bar and line plots
+            :data_path: csv file to read instead of _file_path
+            :partition_root: Directory of the partitioned dataset to read instead of the csv file, not cached as it is columnar already
+            :stores: Stores read from the partitioned dataset and summed per day, all if not given
+            :load_from, load_to: First and last date read from the partitioned dataset e.g. '2018-03' or '2018-03-31'
+            :data_year: Year of the yearly reports, the latest year of the data if not given
         """
+        self.raw_export = raw_export
+        self.file_path = data_path or self._file_path
+        self.partitions = Partitioned_Dataset(partition_root, self._dataset) if partition_root else None
+        self.stores = stores
+        self.load_from = load_from
+        self.load_to = load_to
+        self.use_cache = use_cache and self.partitions is None
+        self.report_cache = Report_Cache(report_cache_size)
+        # Derived measures and models are built once even when threads share the object e.g. the report server
+        self.build_lock = threading.RLock()
+        self.figure_path = None
+        self.bootstrap = bootstrap
+        self.data_version = 0
+        self.data_cache = Data_Cache(self.file_path, f'{self._cache_tag}-{"raw" if raw_export else "clean"}', append_data.get_appended_path(self.file_path))
+        self.model_cache = Data_Cache(self.file_path, f'{self._model_cache_tag}-{"raw" if raw_export else "clean"}', append_data.get_appended_path(self.file_path))
         self.pre_requisite()
+        self.requested_year = data_year
+        self.data_year = str(data_year) if data_year else str(self.all_data.index.max().year)
+
+    def __getstate__(self):
+        """
+            Pickles the object without its lock e.g. for worker processes started with spawn
+        """
+        state = self.__dict__.copy()
+        del state['build_lock']
+        return state
+
+    def __setstate__(self, state):
+        """
+            Restores the object with a new lock
+        """
+        self.__dict__.update(state)
+        self.build_lock = threading.RLock()
 
     def read_csv_data(self):
         """ 
             Read csv file using pandas read_csv method
+            Raw Agata exports (semi-colon delimited, comma decimals) are parsed directly
+        """
+        self.all_data = self.load_csv()
+
+    def read_partitions(self):
+        """
+            Reads the days of the stores in the date range from the partitioned dataset
+            The measures of several stores are summed per day i.e. the figures of the stores together
+        """
+        store_data = self.partitions.load(self.stores, self.load_from, self.load_to, self._measures)
+        self.all_data = store_data.groupby(level = self._date).sum()
+
+    def write_partitions(self, partition_root, store):
+        """
+            Adds the prepared days to the partitioned dataset as the data of the store
+            Returns the list of files written
+        """
+        return Partitioned_Dataset(partition_root, self._dataset).write(self.all_data[self._measures], store)
+
+    def load_csv(self, file_path = None):
+        """
+            Returns the csv file with its appended days (or another file in the same format) as a DataFrame
         """
-        self.all_data = pd.read_csv(self._file_path)
+        if file_path is not None:
+            return pd.read_csv(file_path, **self.get_read_options())
+        return append_data.read_csv_files(self.file_path, **self.get_read_options())
+
+    def get_read_options(self):
+        """
+            Returns the pandas read_csv options for the source file
+        """
+        if self.raw_export:
+            return {'sep': self._raw_separator, 'decimal': self._raw_decimal}
+        return {}
+
+    def read_training_data(self):
+        """
+            Returns a tuple (csv data, appended days or None) with renamed columns for training the models,
+            without replacing the prepared data in all_data
+            Partitioned data has no csv file, the models are trained on the loaded days
+        """
+        if self.partitions is not None:
+            return (self.all_data[self._measures].reset_index(), None)
+
+        training_data = [self.load_csv(file_path) for file_path in append_data.get_source_paths(self.file_path)]
+        for data in training_data:
+            data.columns = [self._date, self._net_purchase, self._gross_sale, self._tax, self._margin]
+        return (training_data[0], training_data[1] if len(training_data) > 1 else None)
 
     def display_figure(self, figure_object, title):
         """ 
             Displays the plot in a popup
+            Saves it to figure_path instead when set i.e. batch rendering
         """
+        from matplotlib import pyplot as plt
+
         plt.title(title)
-        plt.show()
+        if self.figure_path is None:
+            plt.show()
+        else:
+            plt.savefig(self.figure_path, bbox_inches = 'tight')
         plt.close()
 
     def rename_columns(self):
@@ -90,8 +231,9 @@ class DaySell(object):
     def clean_data(self):
         """ Dropping last data ,5414124.75,1218719.16,1220682.59,365027.61
             Because its incomplete and will create noise in the data
+            The totals row is recognised by its missing date rather than by its position
         """
-        self.all_data.drop(len(self.all_data) - 1, inplace = True)
+        self.all_data = self.all_data.dropna(subset = [self._date])
 
     def reload_data(self):
         """ 
@@ -103,21 +245,143 @@ class DaySell(object):
         """ 
             Checks whether all the added columns persist or not
         """
-        current_data = self.all_data
         required_columns = [self._year, self._month, self._day_of_week]
-        if current_data.columns.any() not in required_columns:
+        if not set(required_columns).issubset(self.all_data.columns):
             self.reload_data()
 
     def pre_requisite(self):
         """ 
             Pre requisite methods to run before performing analysis
+            The prepared data is loaded from the columnar cache when the source file is unchanged
+            Bumps the data version so report results computed from the previous data are not reused
+            The trained models are dropped too and looked up again for the current data
+        """
+        self.data_version += 1
+        self.derived_measures = {}
+        self.models = None
+        self.prepare_data()
+        self.build_date_index()
+
+    def prepare_data(self):
+        """
+            Loads the prepared data from the partitioned dataset, the columnar cache or the csv file
         """
+        if self.partitions is not None:
+            self.read_partitions()
+            self.add_more_columns()
+            return
+
+        if self.use_cache:
+            self.all_data = self.data_cache.load_frame(append_data.concat_frames)
+            if self.all_data is not None:
+                return
+
         self.read_csv_data()
         self.rename_columns()
         self.clean_data()
         self.convert_date_type()
         self.add_more_columns()
 
+        if self.use_cache:
+            self.data_cache.store_frame(self.all_data)
+
+    def build_date_index(self):
+        """
+            Sorts the days by date if needed and indexes them for range queries
+            Raises ValueError when a day has no date or appears twice
+        """
+        self.all_data = sort_by_date(self.all_data)
+        self.date_index = Date_Index(self.all_data.index, unique = True)
+
+    def get_days(self, from_date = None, to_date = None):
+        """
+            Returns the days from from_date to to_date, both included, located by binary search on the date index
+            Partial dates select whole periods like DataFrame.loc e.g. ('2018-03', '2018-05')
+        """
+        return self.all_data.iloc[self.date_index.get_slice(from_date, to_date)]
+
+    def read_new_days(self, file_path):
+        """
+            Returns the prepared days of a new export, sorted by date
+            The file must have the dialect and the columns of the data, numbers in every measure and one row per day
+            Raises ValueError otherwise
+        """
+        append_data.check_dialect(file_path, self.raw_export)
+        expected_columns = self._source_columns if self.partitions is not None else append_data.get_header(self.file_path, self.get_read_options())
+        append_data.check_columns(file_path, self.get_read_options(), expected_columns, exact = True)
+
+        # Same preparation steps as the data, on the new days only
+        all_data = self.all_data
+        try:
+            self.all_data = self.load_csv(file_path)
+            self.rename_columns()
+            self.clean_data()
+            self.convert_date_type()
+            self.add_more_columns()
+            new_days = sort_by_date(self.all_data)
+        finally:
+            self.all_data = all_data
+
+        not_numeric = [column for column in self._measures if not pd.api.types.is_numeric_dtype(new_days[column])]
+        if not_numeric:
+            raise ValueError(f'{file_path} has values that are not numbers in {", ".join(not_numeric)}')
+        Date_Index(new_days.index, unique = True)
+        return new_days
+
+    def append_data(self, file_path, store = None):
+        """
+            Adds the days of a new export without preparing the previous days again
+            The new days are validated (see read_new_days) and must not be in the data yet, then
+                csv data: the rows are added to the appended file next to the csv file (see Agata_Append_Data.append_rows)
+                          and stored as a part of the cache, the cached days are not written again
+                partitioned data: the days are written as a new part of the store's month partitions
+            The date index, the derived measures and the prediction models in memory are updated with the new days only
+            :store: Store the days belong to, the store loaded if only one was
+            Returns the number of days added
+        """
+        new_days = self.read_new_days(file_path)
+        if len(new_days) == 0:
+            return 0
+
+        if self.partitions is not None:
+            store = store or (self.stores[0] if self.stores and len(self.stores) == 1 else None)
+            if store is None or (self.stores and store not in self.stores):
+                raise ValueError(f'Choose one of the stores loaded ({", ".join(self.stores or ["all"])}) to add {file_path} to')
+            # Other stores may have the same days, only the days of the store itself are duplicates
+            append_data.check_new_dates(file_path, new_days.index, self.partitions.get_dates([store], new_days.index[0].date(), new_days.index[-1].date()))
+            self.partitions.write(new_days[self._measures], store)
+        else:
+            append_data.check_new_dates(file_path, new_days.index, self.all_data.index)
+            appended_size = self.data_cache.get_appended_state()[0]
+            append_data.append_rows(self.file_path, file_path, self.get_read_options().get('sep', ','))
+
+        # Days of other stores already loaded are summed with the new days
+        if new_days.index.isin(self.all_data.index).any():
+            all_days = pd.concat([self.all_data[self._measures], new_days[self._measures]]).groupby(level = self._date).sum()
+            self.all_data = all_days
+            self.add_more_columns()
+            self.build_date_index()
+        elif new_days.index[0] > self.all_data.index[-1]:
+            self.all_data = pd.concat([self.all_data, new_days])
+            self.date_index.extend(new_days.index)
+        else:
+            self.all_data = pd.concat([self.all_data, new_days])
+            self.build_date_index()
+
+        self.data_version += 1
+        self.derived_measures = {}
+        if self.models is not None:
+            self.update_models(new_days)
+        self.data_year = str(self.requested_year) if self.requested_year else str(self.all_data.index.max().year)
+
+        # The whole data is only cached again when the cache did not have the days before
+        if self.use_cache:
+            if not self.data_cache.store_part(new_days, appended_size):
+                self.data_cache.store_frame(self.all_data)
+            if self.models is not None:
+                self.model_cache.store_object(self.models)
+        return len(new_days)
+
     def get_plot_type(self):
         "Returns the plot type that user wants"
         return input(f'Select plot type ({self._line_plot}, {self._rel_plot}, {self._box_plot}, {self._bar_plot}): ')
@@ -156,26 +420,91 @@ class DaySell(object):
 
         return (from_date, to_date)
 
-    def summarize_whole_data(self, type_of_plot):
+    # Summaries
+    def get_derived_measure(self, name):
+        """
+            Returns a derived measure, computed once per data version and shared by all the reports
+            Net Sales = Gross Sale - Tax
+            Net Sales Percentage = (Net Sales / Gross Sale) * 100
+            Profit Percentage = (Margin / Net Purchase) * 100
+        """
+        measure = self.derived_measures.get(name)
+        if measure is not None:
+            return measure
+
+        with self.build_lock:
+            if name not in self.derived_measures:
+                if name == self._net_sales:
+                    measure = self.all_data[self._gross_sale] - self.all_data[self._tax]
+                elif name == self._net_sales_percentage:
+                    measure = (self.get_derived_measure(self._net_sales) / self.all_data[self._gross_sale]) * 100
+                elif name == self._profit_percentage:
+                    measure = (self.all_data[self._margin] / self.all_data[self._net_purchase]) * 100
+                else:
+                    raise KeyError(name)
+                self.derived_measures[name] = measure.rename(name)
+            return self.derived_measures[name]
+
+    def get_measure(self, name):
+        """
+            Returns a column of the prepared data or a derived measure
+        """
+        if name in self.all_data.columns:
+            return self.all_data[name]
+        return self.get_derived_measure(name)
+
+    def get_plot_frame(self, xvalue, yvalue):
+        """
+            Returns a two column frame (xvalue, yvalue) for plotting without adding columns to all_data
+        """
+        return pd.DataFrame({xvalue: self.get_measure(xvalue), yvalue: self.get_measure(yvalue)})
+
+    @memoize_report
+    def get_monthly_totals(self, how):
+        """
+            Returns Net Purchase, Gross Sale, Tax and Margin of the year resampled month wise
+            :how: 'sum' or 'mean'
+        """
+        monthly_data = getattr(self.all_data.loc[self.data_year, self._measures].resample(self._resample_monthwise), how)()
+        monthly_data[self._month] = monthly_data.index.month
+        return monthly_data
+
+    @memoize_report
+    def get_weekday_totals(self, column, how):
+        """
+            Returns the sum or mean of a column for every day of the week
+            :how: 'sum' or 'mean'
+        """
+        return getattr(self.get_measure(column).groupby(self.all_data[self._day_of_week]), how)().reindex(self._ordered_day)
+
+    def summarize_whole_data(self, type_of_plot = None, col_name = None):
         """
             Displays Lineplot, Relplot, Barplot, Boxplot
             :type_of_plot: 'line', 'rel', 'bar', 'box'
+            :col_name: Column to display, prompted if not given
+            Returns the displayed data
         """
         # Check Consistency
         self.check_data_consistency()
 
-        col_name = self.get_column_name()
+        if col_name is None:
+            col_name = self.get_column_name()
+
+        # Column with month for grouping
+        column_data = self.get_plot_frame(self._month, col_name)
 
         # Set Title
-        title = f"Total {col_name} For The Year 2018"
+        title = f"Total {col_name} For The Year {self.data_year}"
 
         # Plot
         if type_of_plot in [self._line_plot, self._rel_plot]:
-            self.plot_data(type_of_plot, self._date, col_name, self.all_data, title)
+            self.plot_data(type_of_plot, self._date, col_name, column_data, title)
         else:
-            self.plot_data(type_of_plot, self._month, col_name, self.all_data, title)
+            self.plot_data(type_of_plot, self._month, col_name, column_data, title)
+
+        return column_data
 
-    def summarize_whole_data_sum(self, type_of_plot):
+    def summarize_whole_data_sum(self, type_of_plot = None, col_name = None):
         """ 
             Display Sum of the entire column and,
             displays data through: Lineplot, Relplot, Barplot, Boxplot
@@ -185,18 +514,21 @@ class DaySell(object):
         self.check_data_consistency()
 
         # Get column name:
-        col_name = self.get_column_name()
+        if col_name is None:
+            col_name = self.get_column_name()
 
         # Filter Data
-        monthly_data = self.all_data.loc[self._data_year].resample(self._resample_monthwise).sum()
+        monthly_data = self.get_monthly_totals('sum')[[self._month, col_name]]
 
         # Set Title
-        title = f"Total {col_name} (SUM) For The Year 2018"
+        title = f"Total {col_name} (SUM) For The Year {self.data_year}"
 
         # Plot
         self.plot_data(type_of_plot, self._month, col_name, monthly_data, title)
 
-    def summarize_whole_data_average(self, type_of_plot):
+        return monthly_data
+
+    def summarize_whole_data_average(self, type_of_plot = None, col_name = None):
         """ 
             Display Average of the entire column and,
             displays data through: Lineplot, Relplot, Barplot, Boxplot
@@ -206,18 +538,21 @@ class DaySell(object):
         self.check_data_consistency()
 
         # Get column name:
-        col_name = self.get_column_name()
+        if col_name is None:
+            col_name = self.get_column_name()
 
         # Filter Data
-        monthly_data = self.all_data.loc[self._data_year].resample(self._resample_monthwise).mean()
+        monthly_data = self.get_monthly_totals('mean')[[self._month, col_name]]
 
         # Set Title
-        title = f"Average {col_name} For The Year 2018"
+        title = f"Average {col_name} For The Year {self.data_year}"
 
         # Plot
         self.plot_data(type_of_plot, self._month, col_name, monthly_data, title)
+
+        return monthly_data
     
-    def get_net_sales(self, type_of_plot):
+    def get_net_sales(self, type_of_plot = None):
         """ 
             Net Sales = Gross Sale - Tax
             Displays data through: Lineplot, Relplot, Barplot, Boxplot
@@ -226,13 +561,15 @@ class DaySell(object):
         # Check Consistency
         self.check_data_consistency()
 
-        # Calculate Net Sales
-        self.all_data[self._net_sales] = self.all_data[self._gross_sale] - self.all_data[self._tax]
+        # Net Sales of the year
+        net_sales = self.get_plot_frame(self._month, self._net_sales).loc[self.data_year]
 
         # Plot
-        self.plot_data(type_of_plot, self._month, self._net_sales, self.all_data[self._data_year], "Net Sales For The Year 2018")
+        self.plot_data(type_of_plot, self._month, self._net_sales, net_sales, f"Net Sales For The Year {self.data_year}")
 
-    def get_net_sales_monthly(self, type_of_plot):
+        return net_sales
+
+    def get_net_sales_monthly(self, type_of_plot = None):
         """ 
             Net Sales = Gross Sale - Tax
             Sums up the Net Sales for a particular month
@@ -242,16 +579,16 @@ class DaySell(object):
         # Check Consistency
         self.check_data_consistency()
 
-        # Calculate Net Sales
-        self.all_data[self._net_sales_monthly] = self.all_data[self._gross_sale] - self.all_data[self._tax]
-
-        # Monthly Data (SUM)
-        monthly_data = self.all_data.loc[self._data_year].resample(self._resample_monthwise).sum()
+        # Monthly Data (SUM), the sum of Gross Sale - Tax is the difference of the sums
+        monthly_data = self.get_monthly_totals('sum')
+        monthly_data = pd.DataFrame({self._month: monthly_data[self._month], self._net_sales_monthly: monthly_data[self._gross_sale] - monthly_data[self._tax]})
 
         # Plot
-        self.plot_data(type_of_plot, self._month, self._net_sales_monthly, monthly_data, "Monthly Net Sales For The Year 2018")
+        self.plot_data(type_of_plot, self._month, self._net_sales_monthly, monthly_data, f"Monthly Net Sales For The Year {self.data_year}")
 
-    def get_average_net_sales_monthly(self, type_of_plot):
+        return monthly_data
+
+    def get_average_net_sales_monthly(self, type_of_plot = None):
         """ 
             Net Sales = Gross Sale - Tax
             Averages the Net Sales for a particular month
@@ -261,29 +598,31 @@ class DaySell(object):
         # Check Consistency
         self.check_data_consistency()
 
-        # Calculate Net Sales
-        self.all_data[self._net_average_sales_monthly] = self.all_data[self._gross_sale] - self.all_data[self._tax]
-
-        # Monthly Data (SUM)
-        monthly_data = self.all_data.loc[self._data_year].resample(self._resample_monthwise).mean()
+        # Monthly Data (MEAN), the mean of Gross Sale - Tax is the difference of the means
+        monthly_data = self.get_monthly_totals('mean')
+        monthly_data = pd.DataFrame({self._month: monthly_data[self._month], self._net_average_sales_monthly: monthly_data[self._gross_sale] - monthly_data[self._tax]})
 
         # Plot
-        self.plot_data(type_of_plot, self._month, self._net_average_sales_monthly, monthly_data, "Monthly Average Net Sales For The Year 2018")
+        self.plot_data(type_of_plot, self._month, self._net_average_sales_monthly, monthly_data, f"Monthly Average Net Sales For The Year {self.data_year}")
+
+        return monthly_data
 
-    def get_net_sales_percentage(self, type_of_plot):
+    def get_net_sales_percentage(self, type_of_plot = None):
         """ 
             Display Net Sales By Percentage Month Wise
         """
         # Check Consistency
         self.check_data_consistency()
 
-        # Calculate Net Sales Percentage
-        self.all_data[self._net_sales_percentage] = ((self.all_data[self._gross_sale] - self.all_data[self._tax])/self.all_data[self._gross_sale]) * 100
+        # Net Sales Percentage
+        net_sales_percentage = self.get_plot_frame(self._month, self._net_sales_percentage)
 
         # Plot
-        self.plot_data(type_of_plot, self._month, self._net_sales_percentage, self.all_data, "Net Sales In Percentage For The Year 2018")
+        self.plot_data(type_of_plot, self._month, self._net_sales_percentage, net_sales_percentage, f"Net Sales In Percentage For The Year {self.data_year}")
 
-    def get_profit_percentage(self, type_of_plot):
+        return net_sales_percentage
+
+    def get_profit_percentage(self, type_of_plot = None):
         """ 
             Calculates and displays monthly profit percentage
             Profit Percentage = (Margin / Purchase) * 100
@@ -291,88 +630,98 @@ class DaySell(object):
         # Check Consistency
         self.check_data_consistency()
 
-        # Calculate Profit Percentage
-        self.all_data[self._profit_percentage] = (self.all_data[self._margin] / self.all_data[self._net_purchase]) * 100
+        # Profit Percentage
+        profit_percentage = self.get_plot_frame(self._month, self._profit_percentage)
 
         # Plot
-        self.plot_data(type_of_plot, self._month, self._profit_percentage, self.all_data, "Profit Percentage For The Year 2018")
+        self.plot_data(type_of_plot, self._month, self._profit_percentage, profit_percentage, f"Profit Percentage For The Year {self.data_year}")
+
+        return profit_percentage
 
-    def display_data_user_choice(self):
+    def display_data_user_choice(self, from_date = None, to_date = None, col_name = None, type_of_plot = None):
         """ 
             Prompts the user to enter Year, Month and Date
             And then segregates data as per user choice
+            The period, column and plot type are prompted only if the period is not given
+            Returns the displayed data
         """
-        from_date, to_date = self.get_from_to_date()
+        if from_date is None or to_date is None:
+            from_date, to_date = self.get_from_to_date()
+            type_of_plot = self.get_plot_type()
 
-        filtered_data = pd.DataFrame(self.all_data.loc[from_date : to_date])
-
-        filtered_data = filtered_data.reset_index()
+        filtered_data = self.get_days(from_date, to_date).reset_index()
 
         filtered_data[self._date] = filtered_data[self._date].dt.date
 
-        plot_type = self.get_plot_type()
-
-        col_name = self.get_column_name()
+        if col_name is None:
+            col_name = self.get_column_name()
 
         # Set Title
         title = f"{col_name} Data From {from_date} to {to_date}"
 
-        self.plot_data(plot_type, self._date, col_name, filtered_data, title)
+        self.plot_data(type_of_plot, self._date, col_name, filtered_data, title)
 
-    def get_total_sales_daywise(self, type_of_plot):
+        return filtered_data[[self._date, col_name]]
+
+    def get_total_sales_daywise(self, type_of_plot = None):
         """
             Display Total Sales Day Wise
         """
         # Add Total Sales
-        best_selling_day = self.all_data.groupby(self._day_of_week)[self._gross_sale].sum().reindex(self._ordered_day)
+        best_selling_day = self.get_weekday_totals(self._gross_sale, 'sum')
 
         # Reset Index
         best_selling_day = best_selling_day.reset_index()
 
         # Plot
-        self.plot_data(type_of_plot, self._day_of_week, self._gross_sale, best_selling_day, "Best Selling Day For The Year 2018")
+        self.plot_data(type_of_plot, self._day_of_week, self._gross_sale, best_selling_day, f"Best Selling Day For The Year {self.data_year}")
+
+        return best_selling_day
 
-    def get_average_sales_daywise(self, type_of_plot):
+    def get_average_sales_daywise(self, type_of_plot = None):
         """
             Display Average Total Sales Day Wise
         """
         # Calculate Average Total Sales Day Wise
-        best_selling_day = self.all_data.groupby(self._day_of_week)[self._gross_sale].mean().reindex(self._ordered_day)
+        best_selling_day = self.get_weekday_totals(self._gross_sale, 'mean')
 
         # Reset Index
         best_selling_day = best_selling_day.reset_index()
 
         # Plot
-        self.plot_data(type_of_plot, self._day_of_week, self._gross_sale, best_selling_day, "Best Selling Day (Average) For The Year 2018")
+        self.plot_data(type_of_plot, self._day_of_week, self._gross_sale, best_selling_day, f"Best Selling Day (Average) For The Year {self.data_year}")
 
-    def get_profit_daywise(self, type_of_plot):
+        return best_selling_day
+
+    def get_profit_daywise(self, type_of_plot = None):
         """
             Display Profit From Sales Day Wise
         """
         # Calculate Profit Day Wise
-        profit = self.all_data.groupby(self._day_of_week)[self._margin].sum().reindex(self._ordered_day)
+        profit = self.get_weekday_totals(self._margin, 'sum')
 
         # Reset Index
         profit = profit.reset_index()
 
         # Plot
-        self.plot_data(type_of_plot, self._day_of_week, self._margin, profit, "Profit Earned Day Wise For The Year 2018")
+        self.plot_data(type_of_plot, self._day_of_week, self._margin, profit, f"Profit Earned Day Wise For The Year {self.data_year}")
+
+        return profit
 
-    def get_profit_percentage_daywise(self, type_of_plot):
+    def get_profit_percentage_daywise(self, type_of_plot = None):
         """
             Display Profit Percentage Day Wise
         """
-        # Calculate Profit Percentage
-        self.all_data[self._profit_percentage] = (self.all_data[self._margin] / self.all_data[self._net_purchase]) * 100
-
         # Add Profit Percentage Day Wise
-        profit_percentage = self.all_data.groupby(self._day_of_week)[self._profit_percentage].sum().reindex(self._ordered_day)
+        profit_percentage = self.get_weekday_totals(self._profit_percentage, 'sum')
 
         # Reset Index
         profit_percentage = profit_percentage.reset_index()
 
         # Plot
-        self.plot_data(type_of_plot, self._day_of_week, self._profit_percentage, profit_percentage, "Percentage Profit Earned Day Wise For The Year 2018")
+        self.plot_data(type_of_plot, self._day_of_week, self._profit_percentage, profit_percentage, f"Percentage Profit Earned Day Wise For The Year {self.data_year}")
+
+        return profit_percentage
 
     def plot_data(self, type_of_plot, xvalue, yvalue, data, title):
         """ 
@@ -380,58 +729,112 @@ class DaySell(object):
             :xvalue: Column for X-Axis datatype = string
             :yvalue: Column for Y-Axis datatype = string
             :data: Data
+            Nothing is displayed when type_of_plot is None
         """
-        # Plot
+        if type_of_plot is None:
+            return
+
+        # Plotting libraries are only imported once a chart is requested
+        import Agata_Plot_Summary as plot_summary
+
+        # Plot, bar, line and box plots are drawn from per x summaries instead of the rows
         if type_of_plot == self._line_plot:
-            figure = sns.lineplot(x=xvalue, y=yvalue, data=data)
+            figure = plot_summary.lineplot(xvalue, yvalue, data, self.bootstrap)
         elif type_of_plot == self._rel_plot:
-            figure = sns.relplot(x=xvalue, y=yvalue, data=data)
+            figure = plot_summary.relplot(xvalue, yvalue, data)
         elif type_of_plot == self._box_plot:
-            figure = sns.boxplot(x=xvalue, y=yvalue, data=data)
+            figure = plot_summary.boxplot(xvalue, yvalue, data)
         else:
-            figure = sns.barplot(x=xvalue, y=yvalue, data=data)
+            figure = plot_summary.barplot(xvalue, yvalue, data, self.bootstrap)
         self.display_figure(figure, title)
 
-    def predict_future_tax(self):
-        """ 
-            Predicts the future tax based on estimates of net purchase and gross sale
-            With the predicted future tax, evaluates the margin that will be received
+    def train_models(self):
         """
-        # Reload the csv file to clear unnecessary columns
-        self.read_csv_data()
+            Trains the prediction models on the csv data
+            The days appended later are only added to the training data like append_data does,
+            so the models are the same whether they were updated as the days came or trained from the files
+            Returns a dictionary i.e. model name: (model, accuracy on the test data in percent, test features, test targets)
+        """
+        # scikit-learn is only imported when a prediction is requested
+        from sklearn.model_selection import train_test_split
 
-        # Rename columns
-        self.rename_columns()
+        # Read the csv file without the added columns
+        training_data, appended_days = self.read_training_data()
+        models = {}
+
+        for name, (features, target) in self._model_columns.items():
+            # Creates different training and testing dataset
+            # test_size = 0.3 signifies, 30% data will be used for testing and 70% data will be used for training
+            # Plain arrays keep the predictions free of DataFrame overhead
+            x_train, x_test, y_train, y_test = train_test_split(training_data[features].to_numpy(), training_data[target].to_numpy(), test_size=0.3, random_state=2)
 
-        # Creates a dataset exclusing Date Margin and Tax, because that will be predicted by model
-        train = self.all_data.drop([self._date, self._margin, self._tax], axis=1)
+            # Train the model, same coefficients as LinearRegression but new days can be added without a refit
+            simple_regr = Incremental_Linear_Regression().fit(x_train, y_train)
+            models[name] = (simple_regr, simple_regr.score(x_test, y_test) * 100, x_test, y_test)
 
-        # Creates a test dataset to test the trained model
-        test = self.all_data[self._tax]
+        if appended_days is not None:
+            self.add_training_days(models, appended_days)
+        return models
 
-        # Creates different training and testing dataset
-        # test_size = 0.3 signifies, 30% data will be used for testing and 70% data will be used for training
-        x_train, x_test, y_train, y_test = train_test_split(train, test, test_size=0.3, random_state=2)
+    def add_training_days(self, models, new_data):
+        """
+            Adds days to the training data of the models without refitting the previous days
+            :new_data: DataFrame with the columns Net Purchase, Gross Sale, Tax and Margin
+            The accuracy is evaluated again on the unchanged test data
+        """
+        for name, (features, target) in self._model_columns.items():
+            simple_regr, accuracy, x_test, y_test = models[name]
+            simple_regr.partial_fit(new_data[features].to_numpy(), new_data[target].to_numpy())
+            models[name] = (simple_regr, simple_regr.score(x_test, y_test) * 100, x_test, y_test)
 
-        # Create LinearRegression object
-        simple_regr = LinearRegression()
+    def update_models(self, new_data):
+        """
+            Adds new days to the training data of the models in memory, see add_training_days
+            Note: Only the models in memory are updated, append_data persists them with the appended csv file
+        """
+        self.get_model(self._tax_model)
+        with self.build_lock:
+            self.add_training_days(self.models, new_data)
 
-        # Train the model
-        simple_regr.fit(x_train, y_train)
+    def get_model(self, name):
+        """
+            Returns a tuple (model, accuracy)
+            The models are trained once and persisted with the fingerprint of the csv file,
+            so they are reused across runs until the data changes
+        """
+        if self.models is None:
+            with self.build_lock:
+                # Published only once complete, so other threads never see the models half loaded
+                if self.models is None:
+                    models = self.model_cache.load_object() if self.use_cache else None
+                    if models is None:
+                        models = self.train_models()
+                        if self.use_cache:
+                            self.model_cache.store_object(models)
+                    self.models = models
+        simple_regr, accuracy, x_test, y_test = self.models[name]
+        return (simple_regr, accuracy)
+
+    def predict_future_tax(self, net_purchase = None, gross_sale = None):
+        """ 
+            Predicts the future tax based on estimates of net purchase and gross sale
+            With the predicted future tax, evaluates the margin that will be received
+            The estimates are prompted if not given
+            Returns a dictionary with the predicted tax, evaluated margin and accuracy
+        """
+        # Trained model and its accuracy on the test data
+        simple_regr, accuracy = self.get_model(self._tax_model)
 
         # Receive input from the user
-        net_purchase_assume = float(input('Enter Net Purchase: '))
-        gross_sale_assume = float(input('Enter Gross Sale: '))
+        net_purchase_assume = float(input('Enter Net Purchase: ')) if net_purchase is None else float(net_purchase)
+        gross_sale_assume = float(input('Enter Gross Sale: ')) if gross_sale is None else float(gross_sale)
 
-        # Convert the data to dataframe
-        predict_data = pd.DataFrame(np.array([[net_purchase_assume, gross_sale_assume]]), columns=['Net Purchase', 'Gross Sale'])
+        # Net Purchase, Gross Sale in the order the model was trained with
+        predict_data = np.array([[net_purchase_assume, gross_sale_assume]])
 
         # Predict the input
         predicted_tax = simple_regr.predict(predict_data)
 
-        # Get the accuracy of the trained model
-        accuracy = simple_regr.score(x_test, y_test) * 100
-
         # Display the predicted tax with accuracy
         print(f'The predicted tax is {predicted_tax[0]:.2f} with {accuracy:.2f}% accuracy')
 
@@ -441,48 +844,123 @@ class DaySell(object):
         # Display margin
         print(f"Evaluated Profit = {evaluated_margin:.2f}")
 
-    def predict_future_purchase_sales(self):
+        return {self._tax: predicted_tax[0], self._margin: evaluated_margin, 'Accuracy': accuracy}
+
+    def predict_future_purchase_sales(self, tax = None, margin = None):
         """ 
             Predicts the future purchase and gross sale based on estimates of tax and margin
             With the predicted future tax, evaluates the margin that will be received
+            The estimates are prompted if not given
+            Returns a dictionary with the predicted net purchase, gross sale and accuracy
         """
-        # Reload the csv file to clear unnecessary columns
-        self.read_csv_data()
+        # Trained model and its accuracy on the test data
+        simple_regr, accuracy = self.get_model(self._purchase_sale_model)
 
-        # Rename columns
-        self.rename_columns()
+        # Receive input from the user
+        tax_assume = float(input('Enter Tax: ')) if tax is None else float(tax)
+        margin_assume = float(input('Enter Margin: ')) if margin is None else float(margin)
 
-        # Creates a dataset exclusing Date Margin and Tax, because that will be predicted by model
-        train = self.all_data.drop([self._date, self._net_purchase, self._gross_sale], axis=1)
+        # Tax, Margin in the order the model was trained with
+        predict_data = np.array([[tax_assume, margin_assume]])
 
-        # Creates a test dataset to test the trained model
-        test = self.all_data[[self._net_purchase, self._gross_sale]]
+        # Predict the input
+        predicted_purchase_sale = simple_regr.predict(predict_data)
 
-        # Creates different training and testing dataset
-        # test_size = 0.3 signifies, 30% data will be used for testing and 70% data will be used for training
-        x_train, x_test, y_train, y_test = train_test_split(train, test, test_size=0.3, random_state=2)
+        # Display the predicted tax with accuracy
+        print(f'The predicted net purchase is {predicted_purchase_sale[0][0]:.2f} and predicted gross sale is {predicted_purchase_sale[0][1]:.2f} with {accuracy:.2f}% accuracy')
 
-        # Create LinearRegression object
-        simple_regr = LinearRegression()
+        return {self._net_purchase: predicted_purchase_sale[0][0], self._gross_sale: predicted_purchase_sale[0][1], 'Accuracy': accuracy}
 
-        # Train the model
-        simple_regr.fit(x_train, y_train)
+    def read_scenarios(self, scenarios, columns):
+        """
+            Returns the scenarios as a two dimensional array with the given columns
+            :scenarios: csv file path, DataFrame with the columns, or array-like of rows in the order of the columns
+        """
+        if isinstance(scenarios, str):
+            scenarios = pd.read_csv(scenarios, usecols = columns)
+        if isinstance(scenarios, pd.DataFrame):
+            return scenarios[columns].to_numpy(dtype = np.float64)
+
+        scenarios = np.asarray(scenarios, dtype = np.float64)
+        if scenarios.ndim == 1:
+            scenarios = scenarios.reshape(-1, len(columns))
+        if scenarios.ndim != 2 or scenarios.shape[1] != len(columns):
+            raise ValueError(f'Scenarios must have the columns {", ".join(columns)}')
+        return scenarios
+
+    def predict_tax_bulk(self, scenarios, output_path = None):
+        """
+            Predicts the tax and evaluates the margin of many (net purchase, gross sale) scenarios in one call
+            :scenarios: see read_scenarios
+            :output_path: csv file to write the predictions to
+            Returns a DataFrame with the Net Purchase, Gross Sale, predicted Tax and evaluated Margin of every scenario
+        """
+        simple_regr, accuracy = self.get_model(self._tax_model)
+        predict_data = self.read_scenarios(scenarios, [self._net_purchase, self._gross_sale])
 
-        # Receive input from the user
-        tax_assume = float(input('Enter Tax: '))
-        margin_assume = float(input('Enter Margin: '))
+        # Predict all the scenarios at once and evaluate the margins on the arrays
+        predicted_tax = simple_regr.predict(predict_data)
+        evaluated_margin = predict_data[:, 1] - (predict_data[:, 0] + predicted_tax)
 
-        # Convert the data to dataframe
-        predict_data = pd.DataFrame(np.array([[tax_assume, margin_assume]]), columns=[self._tax, self._margin])
+        predictions = pd.DataFrame({self._net_purchase: predict_data[:, 0], self._gross_sale: predict_data[:, 1], self._tax: predicted_tax, self._margin: evaluated_margin})
+        if output_path is not None:
+            predictions.to_csv(output_path, index = False)
+        return predictions
 
-        # Predict the input
+    def predict_purchase_sales_bulk(self, scenarios, output_path = None):
+        """
+            Predicts the net purchase and gross sale of many (tax, margin) scenarios in one call
+            :scenarios: see read_scenarios
+            :output_path: csv file to write the predictions to
+            Returns a DataFrame with the Tax, Margin, predicted Net Purchase and Gross Sale of every scenario
+        """
+        simple_regr, accuracy = self.get_model(self._purchase_sale_model)
+        predict_data = self.read_scenarios(scenarios, [self._tax, self._margin])
+
+        # Predict all the scenarios at once
         predicted_purchase_sale = simple_regr.predict(predict_data)
 
-        # Get the accuracy of the trained model
-        accuracy = simple_regr.score(x_test, y_test) * 100
+        predictions = pd.DataFrame({self._tax: predict_data[:, 0], self._margin: predict_data[:, 1], self._net_purchase: predicted_purchase_sale[:, 0], self._gross_sale: predicted_purchase_sale[:, 1]})
+        if output_path is not None:
+            predictions.to_csv(output_path, index = False)
+        return predictions
 
-        # Display the predicted tax with accuracy
-        print(f'The predicted net purchase is {predicted_purchase_sale[0][0]:.2f} and predicted gross sale is {predicted_purchase_sale[0][1]:.2f} with {accuracy:.2f}% accuracy')
+    def forecast_sales(self, col_name = None, horizon = forecasting._season, model = forecasting._regression, type_of_plot = None):
+        """
+            Forecasts a column for the days after the last date of the data
+            :horizon: Number of days to forecast
+            :model: 'naive', 'seasonal-naive' or 'regression' on lags, rolling means and the day of the week
+            Returns the forecast data
+        """
+        if col_name is None:
+            col_name = self.get_column_name()
+
+        # Forecast from the calendar days of the data
+        forecast = forecasting.forecast(forecasting.get_daily_series(self.all_data, col_name), model, int(horizon))
+        forecast_data = forecast.rename_axis(self._date).reset_index()
+
+        # Set Title
+        title = f"Forecast Of {col_name} For The Next {horizon} Days"
+
+        self.plot_data(type_of_plot, self._date, col_name, forecast_data, title)
+
+        return forecast_data
+
+    def backtest_forecasts(self, col_name = None, horizon = None, model = None, workers = None):
+        """
+            Walk-forward backtest of the forecast models on a column, the configurations run in parallel
+            Every forecast is made only from the days before it, unlike the random train_test_split of the predictions
+            :horizon: Days ahead or a list of them, 1, 7 and 14 if not given
+            :model: Forecast model or a list of them, all if not given
+            Returns a DataFrame of the errors of every model and horizon
+        """
+        if col_name is None:
+            col_name = self.get_column_name()
+
+        horizons = [int(horizon)] if isinstance(horizon, (int, str)) else horizon
+        models = [model] if isinstance(model, str) else model
+
+        return forecasting.backtest(forecasting.get_daily_series(self.all_data, col_name), models, horizons, workers = workers)
 
 def get_plot(day_sell_obj):
     plot = day_sell_obj.get_plot_type()
@@ -490,12 +968,12 @@ def get_plot(day_sell_obj):
         plot = day_sell_obj.get_plot_type()
     return plot
 
-def main():
-    day_sell_obj = DaySell()
+def main(raw_export = False, use_cache = True, bootstrap = False, dataset_options = None):
+    day_sell_obj = DaySell(raw_export, use_cache, bootstrap = bootstrap, **(dataset_options or {}))
     run = True
     while run:
         print('*' * 30)
-        print('Welcome to the Agata Retail Day Sell Data FY 2018')
+        print(f'Welcome to the Agata Retail Day Sell Data FY {day_sell_obj.data_year}')
         print('-' * 30)
         print('1. Display Entire Sales Data')
         print('2. Display Total (SUM) Sales')
@@ -512,7 +990,9 @@ def main():
         print('13. Display Profit Percentage Day Wise')
         print('14. Predict Future Tax and Profit')
         print('15. Predict Future Net Purchase and Gross Sale')
-        print('16. Quit')
+        print('16. Forecast Next Days')
+        print('17. Compare Forecast Models')
+        print('18. Quit')
         choice = input('Enter choice: ')
         print('*' * 30)
         if choice == '1':
@@ -546,9 +1026,35 @@ def main():
         elif choice == '15':
             day_sell_obj.predict_future_purchase_sales()
         elif choice == '16':
+            day_sell_obj.forecast_sales(horizon = int(input('Number of days to forecast: ')), type_of_plot = get_plot(day_sell_obj))
+        elif choice == '17':
+            print(day_sell_obj.backtest_forecasts().to_string(index = False))
+        elif choice == '18':
             run = False
         else:
             print('Invalid choice specified')
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description='Agata Retail Day Sell Analysis')
+    parser.add_argument('--raw', action='store_true', help='Read the original semi-colon delimited export directly')
+    parser.add_argument('--no-cache', action='store_true', help='Prepare the data from the csv file instead of the cache')
+    parser.add_argument('--bootstrap', action='store_true', help='Show bootstrapped confidence intervals on bar and line plots (slow on large data)')
+    partitioned_data.add_dataset_arguments(parser)
+    report_api.add_report_arguments(parser)
+    report_renderer.add_render_arguments(parser)
+    args = parser.parse_args()
+    dataset_options = partitioned_data.get_dataset_options(parser, args)
+    if args.write_partitions:
+        written = DaySell(args.raw, not args.no_cache, **dataset_options).write_partitions(args.write_partitions, args.store[0])
+        print(f'{len(written)} partition files written to {args.write_partitions}')
+        sys.exit(0)
+    if args.append:
+        day_sell_obj = DaySell(args.raw, not args.no_cache, **dataset_options)
+        for file_path in args.append:
+            print(f'{day_sell_obj.append_data(file_path)} days added from {file_path}')
+        sys.exit(0)
+    if args.render_dir:
+        sys.exit(report_renderer.render_reports(DaySell(args.raw, not args.no_cache, bootstrap = args.bootstrap, **dataset_options), args.render_dir, args.plot_types, args.format, args.render_workers))
+    if args.reports or args.list:
+        sys.exit(report_api.run_reports(DaySell(args.raw, not args.no_cache, bootstrap = args.bootstrap, **dataset_options), args))
+    main(args.raw, not args.no_cache, args.bootstrap, dataset_options)
\ No newline at end of file
@@ -0,0 +1,117 @@
+# Dependencies
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+
+# Constants
+_horizon = 7
+_season = 7
+_chunk_size = 500
+_alphas = np.array([0.05, 0.1, 0.15, 0.2, 0.3, 0.4, 0.5])
+_seasonal_min_quantity = 28
+_fit_seconds = 'Fit Seconds'
+_alpha = 'Alpha'
+_level = 'Level'
+_next_week = 'Total'
+
+def get_seasonal_index(values, weekdays):
+    """
+        Returns the demand of every day of the week relative to the average day
+        Series selling less than _seasonal_min_quantity units have too little data and get a flat index
+    """
+    total = values.sum()
+    if total < _seasonal_min_quantity:
+        return np.ones(_season)
+    weekday_sums = np.bincount(weekdays, weights = values, minlength = _season)
+    weekday_counts = np.bincount(weekdays, minlength = _season)
+    index = (weekday_sums / np.maximum(weekday_counts, 1)) / (total / len(values))
+    return np.where(index > 0, index, 1.0)
+
+def fit_series(values, weekdays, forecast_weekdays):
+    """
+        Fits the demand of one product i.e. simple exponential smoothing of the deseasonalized daily quantity
+        The smoothing factor with the lowest one step ahead squared error is chosen from _alphas,
+        every candidate is smoothed with an IIR filter instead of a Python loop over the days
+        Returns a tuple (alpha, level, forecasts of the forecast weekdays)
+    """
+    from scipy.signal import lfilter
+
+    seasonal_index = get_seasonal_index(values, weekdays)
+    adjusted = values / seasonal_index[weekdays]
+
+    # level[t] = alpha * adjusted[t] + (1 - alpha) * level[t - 1], started at the first value
+    levels = np.empty((len(_alphas), len(adjusted)))
+    for position, alpha in enumerate(_alphas):
+        levels[position], _ = lfilter([alpha], [1, alpha - 1], adjusted, zi = [(1 - alpha) * adjusted[0]])
+    errors = ((adjusted[1:] - levels[:, :-1]) ** 2).sum(axis = 1)
+    best = int(np.argmin(errors))
+
+    level = levels[best, -1]
+    return (_alphas[best], level, level * seasonal_index[forecast_weekdays])
+
+def fit_chunk(job):
+    """
+        Fits every product of a chunk, timing each fit
+        :job: (product ids, demand matrix of days x products, weekdays of the days, weekdays of the forecast days)
+        Returns a list of rows (product id, alpha, level, fit seconds, forecasts)
+    """
+    # Import scipy before timing the first fit
+    import scipy.signal
+
+    product_ids, demand, weekdays, forecast_weekdays = job
+    rows = []
+    for position, product_id in enumerate(product_ids):
+        start_time = time.perf_counter()
+        alpha, level, forecasts = fit_series(demand[:, position], weekdays, forecast_weekdays)
+        rows.append((product_id, alpha, level, time.perf_counter() - start_time, forecasts))
+    return rows
+
+def get_demand_matrix(quantity):
+    """
+        Returns the daily demand of every product as one days x products DataFrame
+        :quantity: Series of quantity indexed by (date, product id)
+        Built with a single unstack, days without sales of a product are 0 and missing calendar days are added as 0
+    """
+    demand = quantity.unstack(fill_value = 0)
+    return demand.asfreq('D', fill_value = 0)
+
+def forecast_demand(demand, horizon = _horizon, chunk_size = _chunk_size, workers = None):
+    """
+        Forecasts the demand of every product (column) for the horizon days after the last day of the demand matrix
+        The products are fitted in chunks spread across a pool of worker processes, workers = 1 fits in this process
+        Returns a DataFrame with one row per product: alpha, level, the forecast of every day, the total and the fit time
+    """
+    forecast_dates = pd.date_range(demand.index[-1] + pd.Timedelta(days = 1), periods = horizon, freq = 'D')
+    weekdays = demand.index.dayofweek.to_numpy()
+    forecast_weekdays = forecast_dates.dayofweek.to_numpy()
+    values = demand.to_numpy(dtype = np.float64)
+    product_ids = demand.columns.to_numpy()
+
+    jobs = [(product_ids[start:start + chunk_size], values[:, start:start + chunk_size], weekdays, forecast_weekdays)
+            for start in range(0, len(product_ids), chunk_size)]
+    workers = min(workers or os.cpu_count() or 1, len(jobs)) if jobs else 1
+
+    if workers == 1:
+        chunks = [fit_chunk(job) for job in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers = workers) as executor:
+            chunks = list(executor.map(fit_chunk, jobs))
+
+    rows = [row for chunk in chunks for row in chunk]
+    forecasts = pd.DataFrame(np.array([row[4] for row in rows]).reshape(len(rows), horizon), columns = forecast_dates.strftime('%Y-%m-%d'))
+    forecasts.insert(0, _level, [row[2] for row in rows])
+    forecasts.insert(0, _alpha, [row[1] for row in rows])
+    forecasts.insert(0, demand.columns.name, [row[0] for row in rows])
+    forecasts[_next_week] = forecasts[forecast_dates.strftime('%Y-%m-%d')].sum(axis = 1)
+    forecasts[_fit_seconds] = [row[3] for row in rows]
+    return forecasts
+
+def get_timing_stats(forecasts):
+    """
+        Returns the count, total, mean, median, 95th percentile and maximum fit time of the series
+    """
+    fit_seconds = forecasts[_fit_seconds]
+    return {'Series': len(fit_seconds), 'Total': fit_seconds.sum(), 'Mean': fit_seconds.mean(), 'Median': fit_seconds.median(),
+            '95th Percentile': fit_seconds.quantile(0.95), 'Max': fit_seconds.max()}
@@ -0,0 +1,174 @@
+# Dependencies
+import itertools
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+import pandas as pd
+from Agata_Incremental_Regression import Incremental_Linear_Regression
+
+# Models
+_naive = 'naive'
+_seasonal_naive = 'seasonal-naive'
+_regression = 'regression'
+_models = [_naive, _seasonal_naive, _regression]
+
+# Constants
+_season = 7
+_lags = [1, 2, 3, 7, 14]
+_windows = [7, 28]
+_horizons = [1, 7, 14]
+_min_train_days = 90
+_ordered_day = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+
+# Series the backtests of a worker process run on, set once per worker
+_series = None
+
+def get_daily_series(data, column):
+    """
+        Returns a column of the daily data on a calendar index
+        Days without data (shop closed) are NaN and are neither trained on nor evaluated
+    """
+    return data[column].asfreq('D')
+
+def get_seasonal_lag(horizon):
+    """
+        Returns the lag of the same day of the week known horizon days ahead i.e. 7 for horizons up to 7, then 14, ...
+    """
+    return -(-horizon // _season) * _season
+
+def build_features(series, horizon):
+    """
+        Returns the features of every date for forecasting it horizon days ahead
+        Only values known horizon days before the date are used, so the future never leaks into the features
+            Lags: value horizon + lag - 1 days before
+            Rolling means: mean of the window ending horizon days before (closed days skipped)
+            Weekday: one column per day of the week of the date, Monday is the baseline
+    """
+    known = series.shift(horizon)
+    features = {f'Lag {lag}': series.shift(horizon + lag - 1) for lag in _lags}
+    features.update({f'Rolling Mean {window}': known.rolling(window, min_periods = 1).mean() for window in _windows})
+    weekday = series.index.day_name()
+    features.update({day: (weekday == day).astype(np.float64) for day in _ordered_day[1:]})
+    return pd.DataFrame(features, index = series.index)
+
+def get_naive_forecasts(series, model, horizon):
+    """
+        Returns the naive (last known value) or seasonal naive (same weekday) forecast of every date
+    """
+    if model == _naive:
+        return series.shift(horizon)
+    return series.shift(get_seasonal_lag(horizon))
+
+def walk_forward(series, model, horizon, min_train_days = _min_train_days):
+    """
+        Walk-forward evaluation: at every day from min_train_days on, the model is trained on the days
+        known so far and forecasts the day horizon days ahead
+        The regression is updated incrementally with each new day instead of being refit
+        Returns a DataFrame with the actual and forecast value of every evaluated date
+    """
+    target_dates = series.index[min_train_days + horizon:]
+
+    if model != _regression:
+        forecasts = get_naive_forecasts(series, model, horizon).reindex(target_dates)
+    else:
+        features = build_features(series, horizon)
+        usable = features.notna().all(axis = 1) & series.notna()
+        feature_values = features.to_numpy()
+        target_values = series.to_numpy()
+        simple_regr = Incremental_Linear_Regression()
+        forecasts = pd.Series(np.nan, index = target_dates)
+
+        # Train on every usable date up to the origin, then forecast origin + horizon
+        trained = 0
+        for position in range(min_train_days, len(series) - horizon):
+            new_rows = usable.iloc[trained:position + 1].to_numpy()
+            if new_rows.any():
+                simple_regr.partial_fit(feature_values[trained:position + 1][new_rows], target_values[trained:position + 1][new_rows])
+            trained = position + 1
+            target_position = position + horizon
+            if simple_regr.row_count > feature_values.shape[1] and usable.iloc[target_position]:
+                forecasts.iloc[target_position - min_train_days - horizon] = simple_regr.predict(feature_values[target_position:target_position + 1])[0]
+
+    evaluation = pd.DataFrame({'Actual': series.reindex(target_dates), 'Forecast': forecasts})
+    return evaluation.dropna()
+
+def get_errors(evaluation):
+    """
+        Returns the mean absolute error, root mean squared error and mean absolute percentage error
+    """
+    errors = evaluation['Forecast'] - evaluation['Actual']
+    return {
+        'MAE': errors.abs().mean(),
+        'RMSE': np.sqrt((errors ** 2).mean()),
+        'MAPE': (errors.abs() / evaluation['Actual'].abs()).mean() * 100,
+        'Forecasts': len(evaluation),
+    }
+
+def init_worker(series):
+    """
+        Keeps the series for the backtests of this process
+    """
+    global _series
+    _series = series
+
+def run_backtest(series, job):
+    """
+        Runs the walk-forward evaluation of one (model, horizon) configuration on a series
+    """
+    model, horizon, min_train_days = job
+    start_time = time.perf_counter()
+    errors = get_errors(walk_forward(series, model, horizon, min_train_days))
+    return dict({'Model': model, 'Horizon': horizon}, **errors, Seconds = time.perf_counter() - start_time)
+
+def backtest_job(job):
+    """
+        Runs one configuration on the series of this worker process
+    """
+    return run_backtest(_series, job)
+
+def backtest(series, models = None, horizons = None, min_train_days = _min_train_days, workers = None):
+    """
+        Walk-forward backtest of every model x horizon configuration
+        The configurations are spread across a pool of worker processes, workers = 1 runs in this process
+        Returns a DataFrame of the errors of every configuration, best first within each horizon
+    """
+    jobs = [(model, horizon, min_train_days) for model, horizon in itertools.product(models or _models, horizons or _horizons)]
+    workers = min(workers or os.cpu_count() or 1, len(jobs))
+
+    # In this process the series is passed along, not kept in the worker global, so concurrent backtests do not mix series
+    if workers == 1:
+        results = [run_backtest(series, job) for job in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers = workers, initializer = init_worker, initargs = (series,)) as executor:
+            results = [future.result() for future in as_completed([executor.submit(backtest_job, job) for job in jobs])]
+
+    return pd.DataFrame(results).sort_values(['Horizon', 'MAE']).reset_index(drop = True)
+
+def forecast(series, model = _regression, horizon = _season):
+    """
+        Forecasts the horizon days after the last date of the series
+        Direct strategy: one regression per day ahead, trained on all the usable dates
+        Closed days in the window of a forecast take the value of the last open day before them, the training is unchanged
+        A forecast the regression cannot make (no open day in a window) falls back to the seasonal naive forecast
+        Returns a Series indexed by the forecast dates
+        Raises ValueError when a day cannot be forecast at all
+    """
+    forecast_dates = pd.date_range(series.index[-1] + pd.Timedelta(days = 1), periods = horizon, freq = 'D')
+    extended = series.reindex(series.index.append(forecast_dates))
+    filled = series.ffill().reindex(extended.index)
+    forecasts = []
+    for days_ahead in range(1, horizon + 1):
+        position = len(series) + days_ahead - 1
+        if model == _regression:
+            features = build_features(extended, days_ahead)
+            usable = (features.notna().all(axis = 1) & extended.notna()).to_numpy()
+            simple_regr = Incremental_Linear_Regression().fit(features.to_numpy()[usable], extended.to_numpy()[usable])
+            prediction_features = features.iloc[position].fillna(build_features(filled, days_ahead).iloc[position])
+            if prediction_features.notna().all():
+                forecasts.append(simple_regr.predict(prediction_features.to_numpy().reshape(1, -1))[0])
+                continue
+        forecasts.append(get_naive_forecasts(filled, _seasonal_naive if model == _regression else model, days_ahead).iloc[position])
+        if np.isnan(forecasts[-1]):
+            raise ValueError(f'Not enough data to forecast {forecast_dates[days_ahead - 1].date()} with the {model} model')
+    return pd.Series(forecasts, index = forecast_dates, name = series.name)
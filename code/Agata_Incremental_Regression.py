@@ -0,0 +1,118 @@
+# Dependencies
+import numpy as np
+
+class Incremental_Linear_Regression(object):
+    """
+        Ordinary least squares with an intercept, fitted from running sufficient statistics
+        Keeps the row count, the means and the centered X'X and X'y of all rows seen,
+        so adding rows costs O(rows x features^2) and solving costs O(features^3) however many rows came before
+        The coefficients equal those of sklearn's LinearRegression fitted on all the rows at once
+    """
+
+    def __init__(self):
+        """
+            Class Initialization
+        """
+        self.reset()
+
+    def reset(self):
+        """
+            Forgets every row seen
+        """
+        self.row_count = 0
+        self.single_target = True
+        self.x_mean = None
+        self.y_mean = None
+        self.xx = None
+        self.xy = None
+        self.coef_ = None
+        self.intercept_ = None
+
+    def get_xy(self, x, y):
+        """
+            Returns x as a two dimensional and y as a two dimensional array and whether y was one dimensional
+        """
+        x = np.asarray(x, dtype = np.float64)
+        y = np.asarray(y, dtype = np.float64)
+        if x.ndim == 1:
+            x = x.reshape(-1, 1)
+        single_target = y.ndim == 1
+        if single_target:
+            y = y.reshape(-1, 1)
+        if len(x) != len(y):
+            raise ValueError(f'x has {len(x)} rows but y has {len(y)} rows')
+        return (x, y, single_target)
+
+    def partial_fit(self, x, y):
+        """
+            Adds rows to the sufficient statistics and updates the coefficients
+            The statistics of the new rows are merged with the pairwise update of Chan et al.,
+            which avoids the loss of precision of summing raw X'X on large values
+        """
+        x, y, single_target = self.get_xy(x, y)
+        if len(x) == 0:
+            return self
+
+        # Statistics of the new rows
+        row_count = len(x)
+        x_mean = x.mean(axis = 0)
+        y_mean = y.mean(axis = 0)
+        x_centered = x - x_mean
+        xx = x_centered.T @ x_centered
+        xy = x_centered.T @ (y - y_mean)
+
+        if self.row_count == 0:
+            self.x_mean, self.y_mean, self.xx, self.xy = x_mean, y_mean, xx, xy
+        else:
+            # Merge with the statistics of the previous rows
+            total_count = self.row_count + row_count
+            x_delta = x_mean - self.x_mean
+            y_delta = y_mean - self.y_mean
+            weight = self.row_count * row_count / total_count
+            self.xx = self.xx + xx + weight * np.outer(x_delta, x_delta)
+            self.xy = self.xy + xy + weight * np.outer(x_delta, y_delta)
+            self.x_mean = self.x_mean + x_delta * row_count / total_count
+            self.y_mean = self.y_mean + y_delta * row_count / total_count
+        self.row_count += row_count
+        self.single_target = single_target
+
+        self.solve()
+        return self
+
+    def fit(self, x, y):
+        """
+            Fits the rows from scratch
+        """
+        self.reset()
+        return self.partial_fit(x, y)
+
+    def solve(self):
+        """
+            Solves the normal equations for the coefficients and the intercept
+            lstsq also returns the minimum norm solution when features are collinear
+        """
+        coefficients = np.linalg.lstsq(self.xx, self.xy, rcond = None)[0]
+        intercept = self.y_mean - self.x_mean @ coefficients
+        if self.single_target:
+            self.coef_, self.intercept_ = coefficients[:, 0], intercept[0]
+        else:
+            self.coef_, self.intercept_ = coefficients.T, intercept
+
+    def predict(self, x):
+        """
+            Returns the predictions of the rows of x, one dimensional for a single target
+        """
+        x = np.asarray(x, dtype = np.float64)
+        if x.ndim == 1:
+            x = x.reshape(-1, 1)
+        return x @ self.coef_.T + self.intercept_
+
+    def score(self, x, y):
+        """
+            Returns the coefficient of determination R^2, averaged over the targets like sklearn
+        """
+        x, y, single_target = self.get_xy(x, y)
+        residuals = y - self.predict(x).reshape(y.shape)
+        residual_sum = (residuals ** 2).sum(axis = 0)
+        total_sum = ((y - y.mean(axis = 0)) ** 2).sum(axis = 0)
+        return float(np.mean(1 - residual_sum / total_sum))
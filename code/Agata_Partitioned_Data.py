@@ -0,0 +1,188 @@
+# Dependencies
+import os
+import tempfile
+import pandas as pd
+from Agata_Date_Index import get_date_bounds
+
+class Partitioned_Dataset(object):
+    """
+        Prepared data of many stores and years kept in one file per store, year and month i.e.
+            root/dataset/store=<store>/year=<yyyy>/month=<mm>/part-<n>.parquet
+        The partitions a query needs are chosen from the directory names alone,
+        so a one store, one month query opens one directory whatever the size of the chain's history
+    """
+
+    # Constants
+    _store_prefix = 'store='
+    _year_prefix = 'year='
+    _month_prefix = 'month='
+    _part_prefix = 'part-'
+    _parquet_suffix = '.parquet'
+    _pickle_suffix = '.pkl'
+
+    def __init__(self, root, dataset):
+        """
+            Class Initialization
+            :root: Directory of the partitioned datasets
+            :dataset: Name of the dataset e.g. 'sell' or 'day_sell'
+        """
+        self.root = root
+        self.dataset = dataset
+        self.directory = os.path.join(root, dataset)
+
+    def get_partition_directory(self, store, year, month):
+        """
+            Returns the directory of the partition of a store and month
+        """
+        return os.path.join(self.directory, f'{self._store_prefix}{store}', f'{self._year_prefix}{year:04d}', f'{self._month_prefix}{month:02d}')
+
+    def list_values(self, directory, prefix):
+        """
+            Returns the sorted values of the sub directories named prefix<value>
+        """
+        if not os.path.isdir(directory):
+            return []
+        return sorted(entry.name[len(prefix):] for entry in os.scandir(directory) if entry.is_dir() and entry.name.startswith(prefix))
+
+    def list_parts(self, directory):
+        """
+            Returns the data files of a partition in the order they were written
+        """
+        parts = [entry.name for entry in os.scandir(directory) if entry.name.startswith(self._part_prefix) and entry.name.endswith((self._parquet_suffix, self._pickle_suffix))]
+        return [os.path.join(directory, part) for part in sorted(parts, key = lambda part: int(part[len(self._part_prefix):].split('.')[0]))]
+
+    def get_stores(self):
+        """
+            Returns the stores of the dataset
+        """
+        return self.list_values(self.directory, self._store_prefix)
+
+    def get_partitions(self, stores = None, from_date = None, to_date = None):
+        """
+            Returns the directories of the partitions of the stores that overlap the date range
+            Only the directories of the requested stores are listed, then only the years and months in range
+            :stores: List of stores, all if not given
+        """
+        start, end = get_date_bounds(from_date, to_date)
+        first_month = (start.year, start.month) if start is not None else None
+        last_month = (end.year, end.month) if end is not None else None
+
+        partitions = []
+        for store in stores or self.get_stores():
+            store_directory = os.path.join(self.directory, f'{self._store_prefix}{store}')
+            for year in self.list_values(store_directory, self._year_prefix):
+                if (first_month and int(year) < first_month[0]) or (last_month and int(year) > last_month[0]):
+                    continue
+                year_directory = os.path.join(store_directory, f'{self._year_prefix}{year}')
+                for month in self.list_values(year_directory, self._month_prefix):
+                    if (first_month and (int(year), int(month)) < first_month) or (last_month and (int(year), int(month)) > last_month):
+                        continue
+                    partitions.append(os.path.join(year_directory, f'{self._month_prefix}{month}'))
+        return partitions
+
+    def read_part(self, path, columns = None):
+        """
+            Returns the data of one part file
+        """
+        if path.endswith(self._parquet_suffix):
+            return pd.read_parquet(path, columns = columns)
+        frame = pd.read_pickle(path)
+        return frame if columns is None else frame[columns]
+
+    def read(self, stores = None, from_date = None, to_date = None, columns = None):
+        """
+            Yields the data of every partition of the stores in the date range, one part file at a time
+            Rows of the first and last month outside the range are dropped
+            Raises ValueError when there is no data in the range
+        """
+        start, end = get_date_bounds(from_date, to_date)
+        found = False
+        for partition in self.get_partitions(stores, from_date, to_date):
+            for path in self.list_parts(partition):
+                frame = self.read_part(path, columns)
+                if start is not None:
+                    frame = frame[frame.index >= start]
+                if end is not None:
+                    frame = frame[frame.index <= end]
+                if len(frame):
+                    found = True
+                    yield frame
+        if not found:
+            raise ValueError(f'No {self.dataset} data in {self.directory} for stores {stores or "all"} from {from_date or "the start"} to {to_date or "the end"}')
+
+    def load(self, stores = None, from_date = None, to_date = None, columns = None):
+        """
+            Returns the data of the stores in the date range as one DataFrame
+            Columns that are categorical in the parts stay categorical across the parts
+        """
+        frames = list(self.read(stores, from_date, to_date, columns))
+        data = pd.concat(frames)
+        for column, dtype in frames[0].dtypes.items():
+            if isinstance(dtype, pd.CategoricalDtype) and not isinstance(data[column].dtype, pd.CategoricalDtype):
+                data[column] = data[column].astype('category')
+        return data
+
+    def get_dates(self, stores = None, from_date = None, to_date = None):
+        """
+            Returns the dates of the rows of the stores in the date range, empty if there are none
+            Only the index of the part files is read
+        """
+        try:
+            return self.load(stores, from_date, to_date, columns = []).index
+        except ValueError:
+            return pd.DatetimeIndex([])
+
+    def write(self, frame, store):
+        """
+            Adds the data of a store to its month partitions, the frame must have a DatetimeIndex
+            Each month of the frame is written as a new part file sorted by date,
+            through a temporary file so readers never see a partial part
+            Returns the list of files written
+        """
+        written = []
+        for (year, month), month_data in frame.groupby([frame.index.year, frame.index.month]):
+            directory = self.get_partition_directory(store, year, month)
+            os.makedirs(directory, exist_ok = True)
+            month_data = month_data.sort_index(kind = 'stable')
+            temp_descriptor, temp_path = tempfile.mkstemp(prefix = '.', suffix = '.tmp', dir = directory)
+            os.close(temp_descriptor)
+            try:
+                try:
+                    month_data.to_parquet(temp_path)
+                    suffix = self._parquet_suffix
+                except ImportError:
+                    month_data.to_pickle(temp_path)
+                    suffix = self._pickle_suffix
+                part_path = os.path.join(directory, f'{self._part_prefix}{len(self.list_parts(directory))}{suffix}')
+                os.replace(temp_path, part_path)
+                written.append(part_path)
+            finally:
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+        return written
+
+def add_dataset_arguments(parser):
+    """
+        Adds the command line options choosing the data to analyse
+    """
+    parser.add_argument('--data', help='csv file to analyse instead of the default file')
+    parser.add_argument('--partitions', help='Directory of the partitioned dataset to read instead of the csv file')
+    parser.add_argument('--store', nargs='+', help='Stores read from the partitioned dataset (all if omitted), or the store written with --write-partitions')
+    parser.add_argument('--load-from', help='First date read from the partitioned dataset (yyyy, yyyy-mm or yyyy-mm-dd)')
+    parser.add_argument('--load-to', help='Last date read from the partitioned dataset (yyyy, yyyy-mm or yyyy-mm-dd)')
+    parser.add_argument('--year', help='Year of the yearly reports, the latest year of the data if omitted')
+    parser.add_argument('--write-partitions', metavar='ROOT', help='Write the prepared data of --store to the partitioned dataset in ROOT and exit')
+    parser.add_argument('--append', nargs='+', metavar='FILE', help='Add the rows of new exports to the data (to --store of the partitioned dataset) and exit')
+
+def get_dataset_options(parser, args):
+    """
+        Returns the constructor parameters of the data chosen on the command line
+    """
+    if args.write_partitions and (not args.store or len(args.store) != 1):
+        parser.error('--write-partitions needs exactly one --store')
+    if args.append and args.partitions and (not args.store or len(args.store) != 1):
+        parser.error('--append to --partitions needs exactly one --store')
+    if (args.load_from or args.load_to) and not args.partitions:
+        parser.error('--load-from and --load-to need --partitions')
+    return {'data_path': args.data, 'partition_root': None if args.write_partitions else args.partitions,
+            'stores': None if args.write_partitions else args.store, 'load_from': args.load_from, 'load_to': args.load_to, 'data_year': args.year}
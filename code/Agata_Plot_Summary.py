@@ -0,0 +1,112 @@
+# Dependencies
+import inspect
+import pandas as pd
+import seaborn as sns
+from matplotlib import pyplot as plt
+from matplotlib.axes import Axes
+
+# Constants
+_whisker_range = 1.5
+_quartiles = [0.25, 0.5, 0.75]
+
+# Axes.bxp takes orientation from matplotlib 3.10 on, vert before
+_bxp_orientation = 'orientation' in inspect.signature(Axes.bxp).parameters
+
+def get_order(values):
+    """
+        Returns the x-axis order seaborn would use i.e. categories, sorted numbers or order of appearance
+    """
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        return list(values.cat.categories)
+    if pd.api.types.is_numeric_dtype(values):
+        return sorted(values.dropna().unique())
+    return list(values.dropna().unique())
+
+def get_points(data, xvalue, yvalue):
+    """
+        Returns a frame with the xvalue and yvalue columns, xvalue may also be an index level
+    """
+    data = pd.DataFrame(data)
+    if xvalue not in data.columns:
+        data = data.reset_index()
+    return data[[xvalue, yvalue]]
+
+def get_orientation(points, xvalue, yvalue):
+    """
+        Returns a tuple (category column, value column, horizontal)
+        Like seaborn the plot is horizontal when the x values are numbers and the y values are not e.g. sales per product group
+    """
+    if pd.api.types.is_numeric_dtype(points[xvalue]) and not pd.api.types.is_numeric_dtype(points[yvalue]):
+        return (yvalue, xvalue, True)
+    return (xvalue, yvalue, False)
+
+def get_means(data, xvalue, yvalue):
+    """
+        Returns the mean of the value for every category, one row per bar or line point
+    """
+    points = get_points(data, xvalue, yvalue)
+    category, value, horizontal = get_orientation(points, xvalue, yvalue)
+    return points.groupby(category, sort = False, observed = True)[value].mean().reset_index()
+
+def get_box_stats(data, xvalue, yvalue):
+    """
+        Returns the box plot statistics of the value for every category in the format of Axes.bxp
+        Quartiles, whiskers (last point within 1.5 IQR) and fliers are computed for all groups at once
+    """
+    points = get_points(data, xvalue, yvalue).dropna()
+    xvalue, yvalue, horizontal = get_orientation(points, xvalue, yvalue)
+    quartiles = points.groupby(xvalue, observed = True)[yvalue].quantile(_quartiles).unstack()
+    first_quartile, median, third_quartile = (quartiles[quartile] for quartile in _quartiles)
+    whisker_range = _whisker_range * (third_quartile - first_quartile)
+
+    # Limits of every point's group
+    low = points[xvalue].map(first_quartile - whisker_range).astype(float)
+    high = points[xvalue].map(third_quartile + whisker_range).astype(float)
+    inside = (points[yvalue] >= low) & (points[yvalue] <= high)
+    whiskers = points[inside].groupby(xvalue, observed = True)[yvalue].agg(['min', 'max'])
+    fliers = points[~inside].groupby(xvalue, observed = True)[yvalue].agg(list)
+
+    stats = []
+    for label in get_order(points[xvalue]):
+        if label not in quartiles.index:
+            continue
+        stats.append({'label': label, 'q1': first_quartile[label], 'med': median[label], 'q3': third_quartile[label],
+                      'whislo': whiskers.loc[label, 'min'], 'whishi': whiskers.loc[label, 'max'], 'fliers': fliers.get(label, [])})
+    return stats
+
+def barplot(xvalue, yvalue, data, bootstrap = False):
+    """
+        Bar plot of the mean of yvalue for every xvalue
+        :bootstrap: True to pass the rows to seaborn for bootstrapped confidence intervals, slow on many rows
+    """
+    if bootstrap:
+        return sns.barplot(x=xvalue, y=yvalue, data=data)
+    return sns.barplot(x=xvalue, y=yvalue, data=get_means(data, xvalue, yvalue), errorbar=None)
+
+def lineplot(xvalue, yvalue, data, bootstrap = False):
+    """
+        Line plot of the mean of yvalue for every xvalue
+        :bootstrap: True to pass the rows to seaborn for bootstrapped confidence intervals, slow on many rows
+    """
+    if bootstrap:
+        return sns.lineplot(x=xvalue, y=yvalue, data=data)
+    return sns.lineplot(x=xvalue, y=yvalue, data=get_means(data, xvalue, yvalue), errorbar=None)
+
+def relplot(xvalue, yvalue, data):
+    """
+        Scatter plot of every row
+    """
+    return sns.relplot(x=xvalue, y=yvalue, data=data)
+
+def boxplot(xvalue, yvalue, data):
+    """
+        Box plot drawn from pre-computed quartiles, only the statistics are handed to matplotlib
+    """
+    stats = get_box_stats(data, xvalue, yvalue)
+    horizontal = get_orientation(get_points(data, xvalue, yvalue), xvalue, yvalue)[2]
+    orientation = {'orientation': 'horizontal' if horizontal else 'vertical'} if _bxp_orientation else {'vert': not horizontal}
+    figure = plt.gca()
+    figure.bxp(stats, positions = range(len(stats)), patch_artist = True, boxprops = {'facecolor': sns.color_palette()[0]}, medianprops = {'color': 'black'}, **orientation)
+    figure.set_xlabel(xvalue)
+    figure.set_ylabel(yvalue)
+    return figure
@@ -1,19 +1,51 @@
 # Dependencies
+import argparse
+import os
+import sys
+import threading
 import numpy as np
 import pandas as pd
-import seaborn as sns
-from matplotlib import pyplot as plt
 from datetime import datetime as dt
+from Agata_Data_Cache import Data_Cache
+from Agata_Date_Index import Date_Index, sort_by_date
+import Agata_Append_Data as append_data
+from Agata_Report_Cache import Report_Cache, memoize_report
+import Agata_Demand_Forecast as demand_forecasting
+from Agata_Partitioned_Data import Partitioned_Dataset
+import Agata_Partitioned_Data as partitioned_data
+import Agata_Report_Api as report_api
+import Agata_Report_Renderer as report_renderer
 
 class Product_Sales_Details(object):
 
     # Constants
-    _file_name = '..\csv\SELL_1.csv'
+    _file_name = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'csv', 'SELL_1.csv')
+    _dataset = 'sell'
     _encoding = 'ISO-8859-1'
+    _raw_separator = ';'
+    _raw_decimal = ','
+    _cache_tag = 'prepared-v1'
+    _aggregate_cache_tag = 'aggregates-v2'
+    _chunk_size = 1000000
     _resample_month = 'M'
     _resample_day = 'D'
     _resample_year = 'A'
 
+    # Constants i.e. Name of Columns To Read
+    _pdate = 'Date'
+    _pkod = 'PKod'
+    _pgroup = 'Pgroup'
+    _pname = 'Pname'
+    _pquantity = 'Pquantity'
+    _pce_zn = 'pce_zn'
+    _pwa_zn = 'pwa_zn'
+    _pce_sn = 'pce_sn'
+    _pwa_sn = 'pwa_sn'
+
+    # Compact dtypes of the columns read, prices and values have two decimals so float32 is enough
+    _schema = {_pdate: 'str', _pkod: 'int32', _pgroup: 'category', _pname: 'category', _pquantity: 'float32', _pce_zn: 'float32', _pwa_zn: 'float32', _pce_sn: 'float32', _pwa_sn: 'float32'}
+    _missing_values = [' ']
+
     # Constants i.e. Name of Rows To Drop
     _pmarza = 'pmarza'
     _pudzmarza = 'pudzmarza'
@@ -35,6 +67,7 @@ class Product_Sales_Details(object):
     _net_sale_value = 'Net Sale Value'
     _net_profit_value = 'Net Profit Value'
     _net_profit_percentage = 'Net Profit Percentage'
+    _row_count = 'Row Count'
     _day = 'Day'
     _month = 'Month'
     _day_of_week = 'Day Of Week'
@@ -54,19 +87,77 @@ class Product_Sales_Details(object):
     # Miscelleneuos
     _best_product = 'Best'
     _worst_product = 'Worst'
+    _performance = 'Performance'
+    _rank = 'Rank'
     _ordered_day = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
 
+    # Reports available without prompting i.e. name: (method, fixed parameters, required parameters)
+    _reports = {
+        'product-sales': ('product_group_sales', {}, ['resample_option', 'product_group']),
+        'best-groups': ('best_product_group', {}, ['products_required']),
+        'least-groups': ('least_product_group', {}, ['products_required']),
+        'monthly-net-profit': ('get_monthly_net_profit', {}, []),
+        'monthly-profit-percentage': ('get_monthly_profit_percentage', {}, []),
+        'best-products': ('get_best_product', {'best_or_worst': _best_product}, ['product_group', 'products_required']),
+        'worst-products': ('get_best_product', {'best_or_worst': _worst_product}, ['product_group', 'products_required']),
+        'best-selling-day': ('display_best_selling_day', {}, []),
+        'average-selling-day': ('average_best_selling_day', {}, []),
+        'profit-daywise': ('get_profit_day_wise', {}, []),
+        'profit-percentage-daywise': ('get_profit_percentage_daywise', {}, []),
+        'demand-forecast': ('forecast_product_demand', {}, []),
+        'top-products': ('get_top_products', {}, ['products_required']),
+    }
+
     def read_data(self):
         """
             Read csv data
+            Raw Agata exports (semi-colon delimited, comma decimals) are parsed directly
+            Only the columns kept for analysis are parsed, with compact dtypes
+        """
+        self.file_data = append_data.read_csv_files(self.file_name, **self.get_read_options())
+
+    def get_read_options(self):
+        """
+            Returns the pandas read_csv options for the source file
         """
-        self.file_data = pd.read_csv(self._file_name, encoding = self._encoding)
+        read_options = {'encoding': self._encoding, 'usecols': list(self._schema), 'dtype': self._schema, 'na_values': self._missing_values}
+        if self.raw_export:
+            read_options['sep'] = self._raw_separator
+            read_options['decimal'] = self._raw_decimal
+        return read_options
+
+    def read_data_chunks(self):
+        """
+            Yields the csv data, then the appended rows, in chunks of chunk_size rows
+        """
+        for file_path in append_data.get_source_paths(self.file_name):
+            with pd.read_csv(file_path, chunksize = self.chunk_size, **self.get_read_options()) as reader:
+                for chunk in reader:
+                    yield chunk
+
+    def read_prepared_chunks(self):
+        """
+            Yields the prepared data in chunks without Month and Day Of Week
+            i.e. the csv file chunk_size rows at a time or the partitioned dataset one part file at a time
+        """
+        if self.partitions is not None:
+            for part in self.partitions.read(self.stores, self.load_from, self.load_to):
+                yield part
+            return
+
+        for chunk in self.read_data_chunks():
+            self.file_data = chunk
+            self.drop_columns()
+            self.rename_columns()
+            self.convert_date_to_datetime()
+            yield self.file_data
 
     def drop_columns(self):
         """ 
             Drops unnecessary columns from the data
+            Note: read_data already skips them, this only matters for frames read without the schema
         """
-        self.file_data = self.file_data.drop([self._pmarza, self._pudzmarza, self._pce_sb, self._pwa_sb, self._pudz_sb, self._pmarzajedn, self._pkwmarza], axis = 1)
+        self.file_data = self.file_data.drop([self._pmarza, self._pudzmarza, self._pce_sb, self._pwa_sb, self._pudz_sb, self._pmarzajedn, self._pkwmarza], axis = 1, errors = 'ignore')
 
     def rename_columns(self):
         """
@@ -89,22 +180,21 @@ class Product_Sales_Details(object):
         """ 
             Add more columns - Month, Day
         """
-        self.file_data[self._month] = self.file_data.index.month
-        self.file_data[self._day_of_week] = self.file_data.index.day_name()
+        self.file_data[self._month] = self.file_data.index.month.astype('int8')
+        self.file_data[self._day_of_week] = pd.Categorical(self.file_data.index.day_name(), categories = self._ordered_day)
 
-    def get_user_product_group_choice(self, data):
+    def get_user_product_group_choice(self, product_groups):
         """ 
             Returns product group selected by user
         """
         index = 1
-        unique_product = data[self._product_group].unique()
         print('Product Categories \n')
         user_choice = ''
         run = True
         while run:
 
-            for each_product in unique_product:
-                print(f'{index}. {each_product[0]}')
+            for each_product in product_groups:
+                print(f'{index}. {each_product}')
                 index += 1
                 print('-' * 30)
         
@@ -117,7 +207,7 @@ class Product_Sales_Details(object):
                 print(self._incorrect_choice)
                 continue
 
-        return unique_product[int(user_choice) - 1][0]
+        return product_groups[int(user_choice) - 1]
 
     def get_resample_option(self):
         """
@@ -160,32 +250,102 @@ class Product_Sales_Details(object):
 
         return user_choose
 
-    # Findings
-    def product_group_sales(self, type_of_plot):
+    # Measures
+    def get_rollup(self, levels):
         """
-            Resamples data daywise, monthwise, yearwise
+            Returns the aggregate cube summed over the given index levels
+            Every rollup is computed once and shared by all the reports
+        """
+        levels = tuple(levels)
+        rollup = self.rollups.get(levels)
+        if rollup is not None:
+            return rollup
+
+        with self.build_lock:
+            if levels not in self.rollups:
+                if levels == (self._day_of_week,):
+                    # Day of week is not an index level, it is rolled up from the daily totals
+                    daily_data = self.get_rollup([self._date])
+                    self.rollups[levels] = daily_data.groupby(daily_data.index.day_name().rename(self._day_of_week)).sum().reindex(self._ordered_day)
+                else:
+                    self.rollups[levels] = self.aggregates.groupby(level = list(levels), observed = True).sum()
+            return self.rollups[levels]
+
+    def get_product_groups(self):
+        """
+            Returns the sorted list of product groups
         """
-        # Group By Data
-        grouped_data = self.file_data.groupby(self._product_group)
+        return list(self.get_rollup([self._product_group]).index)
 
-        # Get the resample option
-        resample_option = self.get_resample_option()
+    def get_measure(self, data, column):
+        """
+            Returns a measure of the aggregates
+            Net Profit Value is derived from the net sale and net purchase values
+        """
+        if column == self._net_profit_value:
+            return (data[self._net_sale_value] - data[self._net_purchase_value]).rename(column)
+        return data[column]
 
-        # Resample data and sum
-        resampled_data = grouped_data[self._product_quantity].resample(resample_option).sum()
+    @memoize_report
+    def get_daily_totals(self, column):
+        """
+            Returns the sum of a measure for every date
+        """
+        return self.get_measure(self.get_rollup([self._date]), column)
 
-        # Reset the index and set index to product group for sorting
-        resampled_data = resampled_data.reset_index()
-        resampled_data = resampled_data.set_index(self._product_group)
+    @memoize_report
+    def get_weekday_totals(self, column, average = False):
+        """
+            Returns the sum (or the average per sale) of a measure for every day of the week
+        """
+        weekday_data = self.get_rollup([self._day_of_week])
+        totals = self.get_measure(weekday_data, column)
+        if average:
+            totals = totals / weekday_data[self._row_count]
+        return totals.rename(column)
+
+    @memoize_report
+    def get_group_totals(self, column):
+        """
+            Returns the sum of a measure for every product group
+        """
+        return self.get_measure(self.get_rollup([self._product_group]), column)
 
-        # Display user list of products
-        product_choice = self.get_user_product_group_choice(grouped_data)
+    @memoize_report
+    def get_product_totals(self, product_group, column):
+        """
+            Returns the sum of a measure for every product of a product group
+        """
+        products = self.get_rollup([self._product_group, self._product_name]).xs(product_group, level = self._product_group)
+        return self.get_measure(products, column)
+
+    @memoize_report
+    def get_group_quantity(self, product_group, resample_option):
+        """
+            Returns the quantity sold of a product group resampled day or month wise
+        """
+        quantity = self.get_rollup([self._product_group, self._date]).xs(product_group, level = self._product_group)[self._product_quantity]
+        return quantity.resample(resample_option).sum()
+
+    # Findings
+    def product_group_sales(self, type_of_plot = None, resample_option = None, product_group = None):
+        """
+            Resamples data daywise, monthwise, yearwise
+            The resample option and product group are prompted if not given
+            Returns the displayed data
+        """
+        # Get the resample option
+        if resample_option is None:
+            resample_option = self.get_resample_option()
 
-        # Sort the data Date wise
-        sorted_data = resampled_data
+        # Display user list of products
+        if product_group is None:
+            product_choice = self.get_user_product_group_choice(self.get_product_groups())
+        else:
+            product_choice = product_group
 
-        # Extract data product wise
-        product_data = pd.DataFrame(sorted_data.loc[product_choice])
+        # Resample data and sum
+        product_data = self.get_group_quantity(product_choice, resample_option)
 
         # Reset index to date to avoid duplicate value error on axis
         product_data = product_data.reset_index()
@@ -195,21 +355,22 @@ class Product_Sales_Details(object):
             product_data[self._date] = product_data[self._date].dt.month
 
         # Set title
-        title = f"Sales Of {product_choice} For The Year 2018"
+        title = f"Sales Of {product_choice} For The Year {self.data_year}"
 
         # Plot
         self.plot_data(type_of_plot, self._date, self._product_quantity, product_data, title)
 
-    def best_product_group(self):
+        return product_data
+
+    def best_product_group(self, products_required = None, type_of_plot = None):
         """
             Displays best performing product
             Type of plot : Bar plot
+            The number of product groups is prompted if not given
+            Returns the displayed data
         """
-        # Group by Product
-        product_group = self.file_data.groupby(self._product_group)
-
         # Calculate the sum of net sales for each product group
-        total_sales_product_group = product_group[self._net_sale_value].sum()
+        total_sales_product_group = self.get_group_totals(self._net_sale_value)
 
         # Reset the index to make product group a part of dataframe
         total_sales_product_group = total_sales_product_group.reset_index()
@@ -218,21 +379,25 @@ class Product_Sales_Details(object):
         total_sales_product_group = total_sales_product_group.sort_values(by=[self._net_sale_value])
 
         # Prompt user to get the number of products to be displayed
-        products_required = int(input('Number of best products to be displayed: '))
+        if products_required is None:
+            products_required = int(input('Number of best products to be displayed: '))
+        # Plain labels so the unused categories are not plotted
+        product_groups = total_sales_product_group.tail(products_required).astype({self._product_group: str})
 
         # Plot
-        self.plot_data(self._bar_plot, self._net_sale_value, self._product_group, total_sales_product_group.tail(products_required), "Best Performing Category Of Products For The Year 2018")
+        self.plot_data(type_of_plot, self._net_sale_value, self._product_group, product_groups, f"Best Performing Category Of Products For The Year {self.data_year}")
 
-    def least_product_group(self):
+        return product_groups
+
+    def least_product_group(self, products_required = None, type_of_plot = None):
         """
             Displays least performing product
             Default Type of plot : Bar plot
+            The number of product groups is prompted if not given
+            Returns the displayed data
         """
-        # Group by Product
-        product_group = self.file_data.groupby(self._product_group)
-
         # Calculate the sum of net sales for each product group
-        total_sales_product_group = product_group[self._net_sale_value].sum()
+        total_sales_product_group = self.get_group_totals(self._net_sale_value)
 
         # Reset the index to make product group a part of dataframe
         total_sales_product_group = total_sales_product_group.reset_index()
@@ -241,18 +406,22 @@ class Product_Sales_Details(object):
         total_sales_product_group = total_sales_product_group.sort_values(by=[self._net_sale_value])
 
         # Prompt user to get the number of products to be displayed
-        products_required = int(input('Number of least products to be displayed: '))
+        if products_required is None:
+            products_required = int(input('Number of least products to be displayed: '))
+        # Plain labels so the unused categories are not plotted
+        product_groups = total_sales_product_group.head(products_required).astype({self._product_group: str})
 
         # Plot
-        self.plot_data(self._bar_plot, self._net_sale_value, self._product_group, total_sales_product_group.head(products_required), "Least Performing Category Of Products For The Year 2018")
+        self.plot_data(type_of_plot, self._net_sale_value, self._product_group, product_groups, f"Least Performing Category Of Products For The Year {self.data_year}")
+
+        return product_groups
 
-    def get_monthly_net_profit(self, type_of_plot):
+    def get_monthly_net_profit(self, type_of_plot = None):
         """
             Displays monthly net profit
         """
         # Calculate Net Profit Value
-        self.file_data[self._net_profit_value] = self.file_data[self._net_sale_value] - self.file_data[self._net_purchase_value]
-        monthly_profit_data = self.file_data[self._net_profit_value].resample(self._resample_month).sum()
+        monthly_profit_data = self.get_daily_totals(self._net_profit_value).resample(self._resample_month).sum()
         
         # Reset Index
         profit_data = monthly_profit_data.reset_index()
@@ -261,15 +430,16 @@ class Product_Sales_Details(object):
         profit_data[self._month] = profit_data[self._date].dt.month
 
         # Plot
-        self.plot_data(type_of_plot, self._month, self._net_profit_value, profit_data, "Monthly Sales Profit For The Year 2018")
+        self.plot_data(type_of_plot, self._month, self._net_profit_value, profit_data, f"Monthly Sales Profit For The Year {self.data_year}")
 
-    def get_monthly_profit_percentage(self, type_of_plot):
+        return profit_data
+
+    def get_monthly_profit_percentage(self, type_of_plot = None):
         """
             Displays profit percentage monthly
         """
         # Calculate Profit Percentage
-        self.file_data[self._net_profit_percentage] = ((self.file_data[self._net_sale_value] - self.file_data[self._net_purchase_value]) / self.file_data[self._net_purchase_value]) * 100
-        monthly_profit_percentage = self.file_data[self._net_profit_percentage].resample(self._resample_month).sum()
+        monthly_profit_percentage = self.get_daily_totals(self._net_profit_percentage).resample(self._resample_month).sum()
 
         # Reset Index
         percent_profit = monthly_profit_percentage.reset_index()
@@ -278,105 +448,161 @@ class Product_Sales_Details(object):
         percent_profit[self._month] = percent_profit[self._date].dt.month
 
         # Plot
-        self.plot_data(type_of_plot, self._month, self._net_profit_percentage, percent_profit, "Monthly Profit Percentage Of Sales For The Year 2018")
+        self.plot_data(type_of_plot, self._month, self._net_profit_percentage, percent_profit, f"Monthly Profit Percentage Of Sales For The Year {self.data_year}")
+
+        return percent_profit
 
-    def get_best_product(self, best_or_worst):
+    def get_best_product(self, best_or_worst, product_group = None, products_required = None, type_of_plot = None):
         """
             Displays best performing product based on product group
             Default Type of plot : Bar plot
+            The product group and number of products are prompted if not given
+            Returns the displayed data
         """
-        # Group by Product
-        product_group = self.file_data.groupby(self._product_group)
-
         # Display user list of product groups
-        product_group_choice = self.get_user_product_group_choice(product_group)
-
-        # Get List of products according to product group
-        products = product_group.get_group(product_group_choice)
-
-        # Convert to dataframe to perform more operations
-        products = pd.DataFrame(products).groupby(self._product_name)
-
-        # Sum of sales value
-        total_sales = products[self._net_sale_value].sum()
-
-        # Reset index
-        total_sales = total_sales.reset_index()
+        if product_group is None:
+            product_group_choice = self.get_user_product_group_choice(self.get_product_groups())
+        else:
+            product_group_choice = product_group
 
-        # Sort by Net Sale Value
-        total_sales = total_sales.sort_values(by=[self._net_sale_value])
+        # Sum of sales value of the products in the product group
+        total_sales = self.get_product_totals(product_group_choice, self._net_sale_value)
 
         # Get user choice number to display the number of products
-        products_required = int(input(f'Number of {best_or_worst} products to be displayed: '))
+        if products_required is None:
+            products_required = int(input(f'Number of {best_or_worst} products to be displayed: '))
 
         # Set Title
-        title = f"{best_or_worst} Performing Products For The Year 2018 In The Category {product_group_choice}"
+        title = f"{best_or_worst} Performing Products For The Year {self.data_year} In The Category {product_group_choice}"
 
-        # Plot
+        # Select the products without sorting the whole group, only the selection is sorted by Net Sale Value
         if best_or_worst == self._best_product:
-            self.plot_data(self._bar_plot, self._net_sale_value, self._product_name, total_sales.tail(products_required), title)
+            products = total_sales.nlargest(products_required)
         else:
-            self.plot_data(self._bar_plot, self._net_sale_value, self._product_name, total_sales.head(products_required), title)
+            products = total_sales.nsmallest(products_required)
+        products = products.sort_values().reset_index()
 
-    def display_best_selling_day(self, type_of_plot):
+        # Plain labels so the unused categories are not plotted
+        products = products.astype({self._product_name: str})
+
+        # Plot
+        self.plot_data(type_of_plot, self._net_sale_value, self._product_name, products, title)
+
+        return products
+
+    def display_best_selling_day(self, type_of_plot = None):
         """
             Displays the best selling based on net sale value
         """
         # Add all the total sales day wise
-        best_selling_day = self.file_data.groupby(self._day_of_week)[self._net_sale_value].sum().reindex(self._ordered_day)
+        best_selling_day = self.get_weekday_totals(self._net_sale_value)
 
         # Reset Index
         best_selling_day = best_selling_day.reset_index()
 
         # Plot
-        self.plot_data(type_of_plot, self._day_of_week, self._net_sale_value, best_selling_day, "Total Sale Day Wise For The Year 2018")
+        self.plot_data(type_of_plot, self._day_of_week, self._net_sale_value, best_selling_day, f"Total Sale Day Wise For The Year {self.data_year}")
+
+        return best_selling_day
 
-    def average_best_selling_day(self, type_of_plot):
+    def average_best_selling_day(self, type_of_plot = None):
         """
             Display the best selling day based on average of net sale value
         """
         # Calculte average day wise
-        best_selling_day = self.file_data.groupby(self._day_of_week)[self._net_sale_value].mean().reindex(self._ordered_day)
+        best_selling_day = self.get_weekday_totals(self._net_sale_value, average = True)
 
         # Reset Index
         best_selling_day = best_selling_day.reset_index()
 
         # Plot
-        self.plot_data(type_of_plot, self._day_of_week, self._net_sale_value, best_selling_day, "Average Total Sale Day Wise For The Year 2018")
+        self.plot_data(type_of_plot, self._day_of_week, self._net_sale_value, best_selling_day, f"Average Total Sale Day Wise For The Year {self.data_year}")
 
-    def get_profit_day_wise(self, type_of_plot):
+        return best_selling_day
+
+    def get_profit_day_wise(self, type_of_plot = None):
         """
             Displays total profit earned day wise
         """
-        # Calculate Profit
-        self.file_data[self._net_profit_value] = self.file_data[self._net_sale_value] - self.file_data[self._net_purchase_value]
-
         # Add the profit day wise
-        profit_data = self.file_data.groupby(self._day_of_week)[self._net_profit_value].sum().reindex(self._ordered_day)
+        profit_data = self.get_weekday_totals(self._net_profit_value)
 
         # Reset Index
         profit_data = profit_data.reset_index()
 
         # Plot
-        self.plot_data(type_of_plot, self._day_of_week, self._net_profit_value, profit_data, "Net Profit Day Wise For The Year 2018")
+        self.plot_data(type_of_plot, self._day_of_week, self._net_profit_value, profit_data, f"Net Profit Day Wise For The Year {self.data_year}")
 
-    def get_profit_percentage_daywise(self, type_of_plot):
+        return profit_data
+
+    def get_profit_percentage_daywise(self, type_of_plot = None):
         """
             Displays total profit percentage earned day wise
         """
-
-        # Calculate Profit Percentage
-        self.file_data[self._net_profit_percentage] = ((self.file_data[self._net_sale_value] - self.file_data[self._net_purchase_value]) / self.file_data[self._net_purchase_value]) * 100
-
-        # Add the profit day wise
-        profit_data = self.file_data.groupby(self._day_of_week)[self._net_profit_percentage].sum().reindex(self._ordered_day)
+        # Add the profit percentage day wise
+        profit_data = self.get_weekday_totals(self._net_profit_percentage)
 
         # Reset Index
         profit_data = profit_data.reset_index()
 
         # Plot
-        self.plot_data(type_of_plot, self._day_of_week, self._net_profit_percentage, profit_data, "Net Profit Percentage Day Wise For The Year 2018") 
-        
+        self.plot_data(type_of_plot, self._day_of_week, self._net_profit_percentage, profit_data, f"Net Profit Percentage Day Wise For The Year {self.data_year}")
+
+        return profit_data
+
+    def forecast_product_demand(self, horizon = demand_forecasting._horizon, workers = None, output_path = None):
+        """
+            Forecasts the quantity sold of every product for the days after the last date of the data
+            The daily series of all products are built with one pivot of the aggregate cube
+            and fitted in parallel chunks, see Agata_Demand_Forecast.py
+            :output_path: csv file to write the forecasts to, not written if empty
+            Returns a DataFrame with one row per ProductID: product name and group, forecasts and fit time
+        """
+        # Days x products matrix of the quantity sold
+        quantity = self.get_rollup([self._date, self._product_id])[self._product_quantity]
+        demand = demand_forecasting.get_demand_matrix(quantity)
+
+        forecasts = demand_forecasting.forecast_demand(demand, int(horizon), workers = workers)
+
+        # Add the name and group of every product
+        products = self.aggregates.index.droplevel(self._date).unique().to_frame(index = False).drop_duplicates(self._product_id)
+        forecasts = products[[self._product_id, self._product_group, self._product_name]].merge(forecasts, on = self._product_id)
+
+        # Display the fit times of the series
+        timing_stats = demand_forecasting.get_timing_stats(forecasts)
+        print(', '.join(f'{name}: {value:.6f}s' if name != 'Series' else f'{name}: {value}' for name, value in timing_stats.items()))
+
+        if output_path:
+            forecasts.to_csv(output_path, index = False)
+        return forecasts
+
+    def get_top_products(self, products_required = None):
+        """
+            Returns the best and worst products of every product group at once
+            The products of every group are selected with a partial selection (nlargest / nsmallest) in one grouped pass,
+            without per group copies or a full sort of the groups
+            :products_required: Number of best and of worst products per product group, prompted if not given
+        """
+        if products_required is None:
+            products_required = int(input('Number of best and worst products per product group: '))
+
+        # Sum of sales value of every product of every product group
+        total_sales = self.get_rollup([self._product_group, self._product_name])[self._net_sale_value]
+        product_groups = total_sales.groupby(level = self._product_group, observed = True, group_keys = False)
+
+        top_products = []
+        for best_or_worst, select, ascending in [(self._best_product, product_groups.nlargest, False), (self._worst_product, product_groups.nsmallest, True)]:
+            # Only the selected products are ordered, ties in the order of the data
+            # (nlargest falls back to an unstable sort when a group has fewer products than required)
+            products = select(products_required)
+            products = products.iloc[np.argsort(total_sales.index.get_indexer(products.index), kind = 'stable')].sort_values(ascending = ascending, kind = 'stable')
+            rank = products.groupby(level = self._product_group, observed = True).cumcount() + 1
+            top_products.append(pd.DataFrame({self._performance: best_or_worst, self._rank: rank.astype('int32'), self._net_sale_value: products}))
+
+        # Only the selected rows are ordered
+        top_products = pd.concat(top_products).reset_index()
+        return top_products.sort_values([self._product_group, self._performance, self._rank]).reset_index(drop = True)
+
     def get_plot_type(self):
         "Returns the plot type that user wants"
         return input(f'Select plot type ({self._line_plot}, {self._rel_plot}, {self._box_plot}, {self._bar_plot}): ')
@@ -384,9 +610,15 @@ class Product_Sales_Details(object):
     def display_figure(self, figure_object, title):
         """ 
             Displays the plot in a popup
+            Saves it to figure_path instead when set i.e. batch rendering
         """
+        from matplotlib import pyplot as plt
+
         plt.title(title)
-        plt.show()
+        if self.figure_path is None:
+            plt.show()
+        else:
+            plt.savefig(self.figure_path, bbox_inches = 'tight')
         plt.close()
 
     def plot_data(self, type_of_plot, xvalue, yvalue, data, title):
@@ -395,35 +627,343 @@ class Product_Sales_Details(object):
             :xvalue: Column for X-Axis datatype = string
             :yvalue: Column for Y-Axis datatype = string
             :data: Data
+            Nothing is displayed when type_of_plot is None
         """
-        # Plot
+        if type_of_plot is None:
+            return
+
+        # Plotting libraries are only imported once a chart is requested
+        import Agata_Plot_Summary as plot_summary
+
+        # Plot, bar, line and box plots are drawn from per x summaries instead of the rows
         if type_of_plot == self._line_plot:
-            figure = sns.lineplot(x=xvalue, y=yvalue, data=data)
+            figure = plot_summary.lineplot(xvalue, yvalue, data, self.bootstrap)
         elif type_of_plot == self._rel_plot:
-            figure = sns.relplot(x=xvalue, y=yvalue, data=data)
+            figure = plot_summary.relplot(xvalue, yvalue, data)
         elif type_of_plot == self._box_plot:
-            figure = sns.boxplot(x=xvalue, y=yvalue, data=data)
+            figure = plot_summary.boxplot(xvalue, yvalue, data)
         else:
-            figure = sns.barplot(x=xvalue, y=yvalue, data=data)
+            figure = plot_summary.barplot(xvalue, yvalue, data, self.bootstrap)
         self.display_figure(figure, title)
 
-    def __init__(self):
-        """ Class Initialisation """
-        self.file_data = None
+    def prepare_data(self):
+        """
+            Loads the prepared data from the columnar cache when the source file is unchanged,
+            otherwise prepares it from the csv file and caches it
+            Partitioned data is already prepared, only the partitions of the stores and dates are read
+        """
+        if self.partitions is not None:
+            self.file_data = self.partitions.load(self.stores, self.load_from, self.load_to)
+            self.add_more_columns()
+            return
+
+        if self.use_cache:
+            self.file_data = self.data_cache.load_frame(append_data.concat_frames)
+            if self.file_data is not None:
+                return
+
         self.read_data()
         self.drop_columns()
         self.rename_columns()
         self.convert_date_to_datetime()
         self.add_more_columns()
 
+        if self.use_cache:
+            self.data_cache.store_frame(self.file_data)
+
+    def aggregate_rows(self, rows = None):
+        """
+            Folds the prepared rows (file_data if not given) into the aggregate cube i.e. sums per date, product group, product name and product id
+            of quantity, purchase value, sale value and row count
+            Net Profit Percentage holds the sum of the row level percentages
+        """
+        rows = self.file_data if rows is None else rows
+        net_sale_value = rows[self._net_sale_value].astype('float64')
+        net_purchase_value = rows[self._net_purchase_value].astype('float64')
+        measures = pd.DataFrame({
+            self._product_quantity: rows[self._product_quantity].astype('float64'),
+            self._net_purchase_value: net_purchase_value,
+            self._net_sale_value: net_sale_value,
+            self._net_profit_percentage: ((net_sale_value - net_purchase_value) / net_purchase_value) * 100,
+            self._row_count: 1
+        }, index = rows.index)
+        return measures.groupby([rows.index, rows[self._product_group], rows[self._product_name], rows[self._product_id]], observed = True).sum()
+
+    def merge_aggregates(self, partial_aggregates):
+        """
+            Merges partial aggregates into one
+        """
+        return pd.concat(partial_aggregates).groupby(level = [self._date, self._product_group, self._product_name, self._product_id], observed = True).sum()
+
+    def concat_aggregates(self, partial_aggregates):
+        """
+            Returns aggregates of different dates one after the other as one cube, sorted by date
+            e.g. the cached cube and the aggregates of the rows appended since
+        """
+        aggregates = pd.concat(partial_aggregates)
+        if not aggregates.index.get_level_values(self._date).is_monotonic_increasing:
+            aggregates = aggregates.sort_index(level = self._date, sort_remaining = False, kind = 'stable')
+        return aggregates
+
+    def build_aggregates(self):
+        """
+            Streams the csv file (or the partitions) in chunks and folds every chunk into partial aggregates
+            Memory is bounded by the chunk size and the number of (date, product) pairs, not the file size
+        """
+        partial_aggregates = []
+        partial_rows = 0
+        merge_threshold = self.chunk_size
+        for chunk in self.read_prepared_chunks():
+            self.file_data = chunk
+            partial_aggregates.append(self.aggregate_rows())
+            partial_rows += len(partial_aggregates[-1])
+
+            # Merge the partial aggregates once they grow, so only one merged copy is kept
+            if partial_rows > merge_threshold:
+                partial_aggregates = [self.merge_aggregates(partial_aggregates)]
+                partial_rows = len(partial_aggregates[0])
+                merge_threshold = 2 * partial_rows + self.chunk_size
+
+        self.file_data = None
+        return self.merge_aggregates(partial_aggregates)
+
+    def get_aggregate_cache(self):
+        """
+            Returns the cache of the aggregate cube of the csv file
+        """
+        return Data_Cache(self.file_name, f'{self._aggregate_cache_tag}-{"raw" if self.raw_export else "clean"}', append_data.get_appended_path(self.file_name))
+
+    def prepare_aggregates(self):
+        """
+            Loads the aggregate cube from the columnar cache when the source file is unchanged,
+            otherwise builds it from the loaded data (or by streaming the csv file) and caches it
+            Bumps the data version so report results computed from the previous data are not reused
+        """
+        self.rollups = {}
+        self.data_version += 1
+        aggregate_cache = self.get_aggregate_cache()
+        if self.use_cache:
+            self.aggregates = aggregate_cache.load_frame(self.concat_aggregates)
+            if self.aggregates is not None:
+                return
+
+        if self.file_data is not None:
+            self.aggregates = self.aggregate_rows()
+        else:
+            self.aggregates = self.build_aggregates()
+
+        if self.use_cache:
+            aggregate_cache.store_frame(self.aggregates)
+
+    def write_partitions(self, partition_root, store):
+        """
+            Adds the prepared data to the partitioned dataset as the data of the store
+            Data not kept in memory (out of core) is written chunk by chunk
+            Returns the list of files written
+        """
+        dataset = Partitioned_Dataset(partition_root, self._dataset)
+        if self.file_data is not None:
+            return dataset.write(self.file_data.drop(columns = [self._month, self._day_of_week]), store)
+        written = []
+        for chunk in self.read_prepared_chunks():
+            written.extend(dataset.write(chunk, store))
+        self.file_data = None
+        return written
+
+    def build_date_index(self):
+        """
+            Sorts the rows kept in memory by date if needed and indexes them i.e. row offsets of every month
+            Out of core there are no rows in memory and no index
+        """
+        self.date_index = None
+        if self.file_data is not None:
+            self.file_data = sort_by_date(self.file_data)
+            self.date_index = Date_Index(self.file_data.index)
+
+    def get_rows(self, from_date = None, to_date = None):
+        """
+            Returns the rows from from_date to to_date, both included, located by binary search on the date index
+            Partial dates select whole periods like DataFrame.loc e.g. ('2018-03', '2018-05')
+        """
+        if self.date_index is None:
+            raise ValueError('Rows are not kept in memory out of core, use the aggregates')
+        return self.file_data.iloc[self.date_index.get_slice(from_date, to_date)]
+
+    def read_new_rows(self, file_path):
+        """
+            Returns the prepared rows of a new export sorted by date
+            The file must have the dialect and the columns of the data and values of the expected types
+            Raises ValueError otherwise
+        """
+        append_data.check_dialect(file_path, self.raw_export)
+        header_options = {'encoding': self._encoding, 'sep': self.get_read_options().get('sep', ',')}
+        if self.partitions is not None:
+            append_data.check_columns(file_path, header_options, list(self._schema))
+        else:
+            append_data.check_columns(file_path, header_options, append_data.get_header(self.file_name, header_options), exact = True)
+
+        # Same preparation steps as the data, on the new rows only
+        file_data = self.file_data
+        try:
+            self.file_data = pd.read_csv(file_path, **self.get_read_options())
+            self.drop_columns()
+            self.rename_columns()
+            self.convert_date_to_datetime()
+            self.add_more_columns()
+            new_rows = sort_by_date(self.file_data)
+        finally:
+            self.file_data = file_data
+
+        Date_Index(new_rows.index)
+        return new_rows
+
+    def update_aggregates(self, new_aggregates):
+        """
+            Adds the aggregates of new rows to the cube and to every rollup computed so far,
+            the previous rows are not aggregated again
+            The cube is only merged (summed) when the new dates are already in it i.e. the same days of another store
+        """
+        new_dates = new_aggregates.index.get_level_values(self._date)
+        with self.build_lock:
+            cube_dates = self.get_rollup([self._date]).index
+            if new_dates.isin(cube_dates).any():
+                self.aggregates = self.merge_aggregates([self.aggregates, new_aggregates])
+            else:
+                self.aggregates = self.concat_aggregates([self.aggregates, new_aggregates])
+
+            for levels in list(self.rollups):
+                if levels == (self._day_of_week,):
+                    # Rolled up from the daily totals again when next needed
+                    del self.rollups[levels]
+                    continue
+                new_rollup = new_aggregates.groupby(level = list(levels), observed = True).sum()
+                self.rollups[levels] = pd.concat([self.rollups[levels], new_rollup]).groupby(level = list(levels), observed = True).sum()
+
+    def append_data(self, file_path, store = None):
+        """
+            Adds the rows of a new export without preparing or aggregating the previous rows again
+            The new rows are validated (see read_new_rows) and their days must not be in the data yet, then
+                csv data: the rows are added to the appended file next to the csv file (see Agata_Append_Data.append_rows)
+                          and stored as parts of the caches, the cached rows and cube are not written again
+                partitioned data: the rows are written as a new part of the store's month partitions
+            The rows in memory, the date index, the aggregate cube and its rollups are updated with the new rows only
+            :store: Store the rows belong to, the store loaded if only one was
+            Returns the number of rows added
+        """
+        new_rows = self.read_new_rows(file_path)
+        if len(new_rows) == 0:
+            return 0
+
+        if self.partitions is not None:
+            store = store or (self.stores[0] if self.stores and len(self.stores) == 1 else None)
+            if store is None or (self.stores and store not in self.stores):
+                raise ValueError(f'Choose one of the stores loaded ({", ".join(self.stores or ["all"])}) to add {file_path} to')
+            # Other stores may have the same days, only the days of the store itself are duplicates
+            append_data.check_new_dates(file_path, new_rows.index, self.partitions.get_dates([store], new_rows.index[0].date(), new_rows.index[-1].date()))
+            self.partitions.write(new_rows.drop(columns = [self._month, self._day_of_week]), store)
+        else:
+            append_data.check_new_dates(file_path, new_rows.index, self.get_rollup([self._date]).index)
+            appended_size = self.data_cache.get_appended_state()[0]
+            append_data.append_rows(self.file_name, file_path, self.get_read_options().get('sep', ','))
+
+        new_aggregates = self.aggregate_rows(new_rows)
+        self.update_aggregates(new_aggregates)
+        if self.file_data is not None:
+            # New products are added to the categories so the columns stay categorical without recoding the previous rows
+            for column in [self._product_group, self._product_name]:
+                new_categories = new_rows[column].cat.categories.difference(self.file_data[column].cat.categories)
+                if len(new_categories):
+                    self.file_data[column] = self.file_data[column].cat.add_categories(new_categories)
+                new_rows[column] = new_rows[column].cat.set_categories(self.file_data[column].cat.categories)
+            follows = new_rows.index[0] >= self.file_data.index[-1]
+            self.file_data = pd.concat([self.file_data, new_rows])
+            if follows:
+                self.date_index.extend(new_rows.index)
+            else:
+                self.build_date_index()
+
+        self.data_version += 1
+        self.data_year = str(self.requested_year) if self.requested_year else self.get_data_year()
+
+        # The whole data is only cached again when the cache did not have the rows before
+        if self.use_cache:
+            if self.file_data is not None and not self.data_cache.store_part(new_rows, appended_size):
+                self.data_cache.store_frame(self.file_data)
+            aggregate_cache = self.get_aggregate_cache()
+            if not aggregate_cache.store_part(new_aggregates, appended_size):
+                aggregate_cache.store_frame(self.aggregates)
+        return len(new_rows)
+
+    def get_data_year(self):
+        """
+            Returns the latest year of the data
+        """
+        return str(self.aggregates.index.get_level_values(self._date).max().year)
+
+    def __init__(self, raw_export = False, use_cache = True, out_of_core = False, chunk_size = _chunk_size, report_cache_size = Report_Cache._default_size, bootstrap = False,
+                 data_path = None, partition_root = None, stores = None, load_from = None, load_to = None, data_year = None):
+        """ 
+            Class Initialisation
+            :raw_export: True to read the original export without running Agata_Retail_Clean_Data.py first
+            :use_cache: False to always prepare the data from the csv file
+            :out_of_core: True to stream the csv file in chunks and keep only the aggregate cube in memory
+            :chunk_size: Number of rows read at once in out of core mode
+            :report_cache_size: Number of report results kept in memory
+            :bootstrap: True to show seaborn's bootstrapped confidence intervals on bar and line plots
+            :data_path: csv file to read instead of _file_name
+            :partition_root: Directory of the partitioned dataset to read instead of the csv file, not cached as it is columnar already
+            :stores: Stores read from the partitioned dataset, all if not given
+            :load_from, load_to: First and last date read from the partitioned dataset e.g. '2018-03' or '2018-03-31'
+            :data_year: Year named in the report titles, the latest year of the data if not given
+        """
+        self.raw_export = raw_export
+        self.file_name = data_path or self._file_name
+        self.partitions = Partitioned_Dataset(partition_root, self._dataset) if partition_root else None
+        self.stores = stores
+        self.load_from = load_from
+        self.load_to = load_to
+        self.use_cache = use_cache and self.partitions is None
+        self.chunk_size = chunk_size
+        self.data_cache = Data_Cache(self.file_name, f'{self._cache_tag}-{"raw" if raw_export else "clean"}', append_data.get_appended_path(self.file_name))
+        self.file_data = None
+        self.aggregates = None
+        self.rollups = {}
+        self.report_cache = Report_Cache(report_cache_size)
+        # Rollups are built once even when threads share the object e.g. the report server
+        self.build_lock = threading.RLock()
+        self.figure_path = None
+        self.bootstrap = bootstrap
+        self.data_version = 0
+        if not out_of_core:
+            self.prepare_data()
+        self.build_date_index()
+        self.prepare_aggregates()
+        self.requested_year = data_year
+        self.data_year = str(data_year) if data_year else self.get_data_year()
+
+    def __getstate__(self):
+        """
+            Pickles the object without its lock e.g. for worker processes started with spawn
+        """
+        state = self.__dict__.copy()
+        del state['build_lock']
+        return state
+
+    def __setstate__(self, state):
+        """
+            Restores the object with a new lock
+        """
+        self.__dict__.update(state)
+        self.build_lock = threading.RLock()
+
 def get_plot(product_sales_obj):
     plot = product_sales_obj.get_plot_type()
     while plot not in [product_sales_obj._line_plot, product_sales_obj._rel_plot, product_sales_obj._box_plot, product_sales_obj._bar_plot]:
         plot = product_sales_obj.get_plot_type()
     return plot
 
-def main():
-    product_sales_obj = Product_Sales_Details()
+def main(raw_export = False, use_cache = True, out_of_core = False, bootstrap = False, dataset_options = None):
+    product_sales_obj = Product_Sales_Details(raw_export, use_cache, out_of_core, bootstrap = bootstrap, **(dataset_options or {}))
     run = True
     while run:
         print('-' * 30)
@@ -437,16 +977,18 @@ def main():
         print('8. Display Average Best Selling Day In Week')
         print('9. Display Profit In Value Daywise')
         print('10. Display Profit In Percentage Daywise')
-        print('11. Quit')
+        print('11. Forecast Product Demand')
+        print('12. Display Best / Worst Products Of Every Product Group')
+        print('13. Quit')
         user_choice = input(product_sales_obj._get_choice)
         print('-' * 30)
         if user_choice == '1':
             plot = get_plot(product_sales_obj)
             product_sales_obj.product_group_sales(plot)
         elif user_choice == '2':
-            product_sales_obj.best_product_group()
+            product_sales_obj.best_product_group(type_of_plot = product_sales_obj._bar_plot)
         elif user_choice == '3':
-            product_sales_obj.least_product_group()
+            product_sales_obj.least_product_group(type_of_plot = product_sales_obj._bar_plot)
         elif user_choice == '4':
             plot = get_plot(product_sales_obj)
             product_sales_obj.get_monthly_net_profit(plot)
@@ -455,7 +997,7 @@ def main():
             product_sales_obj.get_monthly_profit_percentage(plot)
         elif user_choice == '6':
             user_choose = product_sales_obj.get_best_worst()
-            product_sales_obj.get_best_product(user_choose)
+            product_sales_obj.get_best_product(user_choose, type_of_plot = product_sales_obj._bar_plot)
         elif user_choice == '7':
             plot = get_plot(product_sales_obj)
             product_sales_obj.display_best_selling_day(plot)
@@ -469,9 +1011,37 @@ def main():
             plot = get_plot(product_sales_obj)
             product_sales_obj.get_profit_percentage_daywise(plot)
         elif user_choice == '11':
+            forecasts = product_sales_obj.forecast_product_demand(output_path = input('Save forecasts to csv file (Enter to skip): ').strip() or None)
+            print(forecasts.sort_values(demand_forecasting._next_week, ascending = False).head(20).to_string(index = False))
+        elif user_choice == '12':
+            print(product_sales_obj.get_top_products().to_string(index = False))
+        elif user_choice == '13':
             run = False
         else:
             print(product_sales_obj._incorrect_choice)
 
 if __name__ == '__main__':
-    main()
+    parser = argparse.ArgumentParser(description='Agata Retail Product Sales Analysis')
+    parser.add_argument('--raw', action='store_true', help='Read the original semi-colon delimited export directly')
+    parser.add_argument('--no-cache', action='store_true', help='Prepare the data from the csv file instead of the cache')
+    parser.add_argument('--bootstrap', action='store_true', help='Show bootstrapped confidence intervals on bar and line plots (slow on large data)')
+    parser.add_argument('--out-of-core', action='store_true', help='Stream the csv file in chunks and keep only aggregates in memory')
+    partitioned_data.add_dataset_arguments(parser)
+    report_api.add_report_arguments(parser)
+    report_renderer.add_render_arguments(parser)
+    args = parser.parse_args()
+    dataset_options = partitioned_data.get_dataset_options(parser, args)
+    if args.write_partitions:
+        written = Product_Sales_Details(args.raw, not args.no_cache, args.out_of_core, **dataset_options).write_partitions(args.write_partitions, args.store[0])
+        print(f'{len(written)} partition files written to {args.write_partitions}')
+        sys.exit(0)
+    if args.append:
+        product_sales_obj = Product_Sales_Details(args.raw, not args.no_cache, args.out_of_core, **dataset_options)
+        for file_path in args.append:
+            print(f'{product_sales_obj.append_data(file_path)} rows added from {file_path}')
+        sys.exit(0)
+    if args.render_dir:
+        sys.exit(report_renderer.render_reports(Product_Sales_Details(args.raw, not args.no_cache, args.out_of_core, bootstrap = args.bootstrap, **dataset_options), args.render_dir, args.plot_types, args.format, args.render_workers))
+    if args.reports or args.list:
+        sys.exit(report_api.run_reports(Product_Sales_Details(args.raw, not args.no_cache, args.out_of_core, bootstrap = args.bootstrap, **dataset_options), args))
+    main(args.raw, not args.no_cache, args.out_of_core, args.bootstrap, dataset_options)
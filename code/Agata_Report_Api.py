@@ -0,0 +1,101 @@
+# Dependencies
+import inspect
+import json
+import os
+import pandas as pd
+
+# Command line options of the report parameters i.e. option: (parameter name, help)
+_report_options = {
+    '--column': ('col_name', 'Column to display'),
+    '--from-date': ('from_date', 'Start of the period (yyyy-mm-dd)'),
+    '--to-date': ('to_date', 'End of the period (yyyy-mm-dd)'),
+    '--resample': ('resample_option', 'D for day wise, M for month wise'),
+    '--group': ('product_group', 'Product group'),
+    '--top': ('products_required', 'Number of products or product groups to display'),
+    '--net-purchase': ('net_purchase', 'Estimated net purchase'),
+    '--gross-sale': ('gross_sale', 'Estimated gross sale'),
+    '--tax': ('tax', 'Estimated tax'),
+    '--margin': ('margin', 'Estimated margin'),
+    '--scenarios': ('scenarios', 'csv file of scenarios to predict in bulk'),
+    '--horizon': ('horizon', 'Number of days to forecast'),
+    '--model': ('model', 'Forecast model (naive, seasonal-naive, regression)'),
+    '--plot': ('type_of_plot', 'Plot type (line, rel, box, bar), no plot if omitted'),
+}
+_numeric_parameters = {'products_required': int, 'horizon': int, 'net_purchase': float, 'gross_sale': float, 'tax': float, 'margin': float}
+
+def run_report(report_obj, report_name, **parameters):
+    """
+        Runs a report of a DaySell or Product_Sales_Details object by name and returns its data
+        Never prompts: raises ValueError when a required parameter is missing
+        Parameters the report does not accept are ignored, so one set of parameters can drive many reports
+    """
+    if report_name not in report_obj._reports:
+        raise ValueError(f'Unknown report {report_name}. Available reports: {", ".join(report_obj._reports)}')
+
+    method_name, fixed_parameters, required_parameters = report_obj._reports[report_name]
+    method = getattr(report_obj, method_name)
+    accepted_parameters = inspect.signature(method).parameters
+    arguments = {name: value for name, value in parameters.items() if name in accepted_parameters and value is not None}
+    arguments.update(fixed_parameters)
+
+    missing_parameters = [name for name in required_parameters if name not in arguments]
+    if missing_parameters:
+        raise ValueError(f'Report {report_name} requires {", ".join(missing_parameters)}')
+
+    return method(**arguments)
+
+def write_report(report_name, data, output_directory = None):
+    """
+        Writes the data of a report to <output_directory>/<report_name>.csv (.json for predictions)
+        Prints it when no output directory is given
+    """
+    if isinstance(data, dict):
+        text, extension = json.dumps(data, indent = 2, default = float), '.json'
+    else:
+        text, extension = pd.DataFrame(data).to_csv(), '.csv'
+
+    if output_directory is None:
+        print(f'{report_name}')
+        print('-' * 30)
+        print(text)
+        return
+
+    os.makedirs(output_directory, exist_ok = True)
+    with open(os.path.join(output_directory, report_name + extension), mode = 'w') as output_file:
+        output_file.write(text)
+
+def add_report_arguments(parser):
+    """
+        Adds the report names and report parameters to an argparse parser
+    """
+    parser.add_argument('reports', nargs = '*', help = 'Reports to run without prompting, the interactive menu runs if omitted')
+    parser.add_argument('--list', action = 'store_true', help = 'List the available reports')
+    parser.add_argument('--output-dir', default = None, help = 'Directory to write the report data to, printed if omitted')
+    for option, (parameter_name, help_text) in _report_options.items():
+        parser.add_argument(option, dest = parameter_name, type = _numeric_parameters.get(parameter_name, str), default = None, help = help_text)
+
+def get_report_parameters(args):
+    """
+        Returns the report parameters parsed by argparse
+    """
+    return {parameter_name: getattr(args, parameter_name) for parameter_name, help_text in _report_options.values()}
+
+def run_reports(report_obj, args):
+    """
+        Runs the reports named on the command line one after another in this process
+        Returns the number of failed reports
+    """
+    if args.list:
+        for report_name, (method_name, fixed_parameters, required_parameters) in report_obj._reports.items():
+            print(f'{report_name}: {", ".join(required_parameters) or "no parameters"}')
+        return 0
+
+    failed = 0
+    parameters = get_report_parameters(args)
+    for report_name in args.reports:
+        try:
+            write_report(report_name, run_report(report_obj, report_name, **parameters), args.output_dir)
+        except (ValueError, KeyError) as error:
+            print(f'{report_name}: {error}')
+            failed += 1
+    return failed
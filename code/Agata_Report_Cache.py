@@ -0,0 +1,86 @@
+# Dependencies
+import functools
+import threading
+from collections import OrderedDict
+
+class Report_Cache(object):
+    """
+        Least recently used report results of one DaySell or Product_Sales_Details object
+        Safe to share between threads (e.g. the report server): every lookup, store and eviction holds the lock,
+        so an eviction never runs between the check and the use of a result
+    """
+
+    # Constants
+    _default_size = 128
+
+    def __init__(self, max_size = _default_size):
+        """
+            Class Initialization
+            :max_size: Maximum number of report results kept, the least recently used is evicted first
+        """
+        self.max_size = max_size
+        self.results = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __getstate__(self):
+        """
+            Pickles the results without the lock e.g. for worker processes started with spawn
+        """
+        state = self.__dict__.copy()
+        del state['lock']
+        return state
+
+    def __setstate__(self, state):
+        """
+            Restores the results with a new lock
+        """
+        self.__dict__.update(state)
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        """
+            Returns a tuple (found, result) and marks the result as recently used
+        """
+        with self.lock:
+            if key in self.results:
+                self.results.move_to_end(key)
+                self.hits += 1
+                return (True, self.results[key])
+            self.misses += 1
+            return (False, None)
+
+    def put(self, key, result):
+        """
+            Stores a result, evicting the least recently used ones above max_size
+        """
+        with self.lock:
+            self.results[key] = result
+            self.results.move_to_end(key)
+            while len(self.results) > self.max_size:
+                self.results.popitem(last = False)
+
+    def clear(self):
+        """
+            Removes all the stored results
+        """
+        with self.lock:
+            self.results.clear()
+
+def memoize_report(method):
+    """
+        Caches the result of a report method in the report_cache of the object
+        The key is (method name, arguments, data_version), so bumping data_version
+        on reload invalidates every result computed from the previous data
+        Note: Cached results are shared, callers must not modify them in place
+    """
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        key = (method.__name__, args, tuple(sorted(kwargs.items())), self.data_version)
+        found, result = self.report_cache.get(key)
+        if not found:
+            result = method(self, *args, **kwargs)
+            self.report_cache.put(key, result)
+        return result
+    return wrapper
@@ -0,0 +1,218 @@
+# Dependencies
+import argparse
+import asyncio
+import functools
+import itertools
+import os
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import Agata_Report_Api as report_api
+import Agata_Report_Renderer as report_renderer
+import Agata_Report_Server as report_server
+
+# Constants
+_pending_per_worker = 4
+
+# Object the reports of a worker process are run on, set once per worker
+_report_obj = None
+
+def init_worker(report_obj):
+    """
+        Keeps the loaded object for the reports of this process
+        With the default fork start method on Linux the object is shared with the parent, not copied upfront
+    """
+    global _report_obj
+    _report_obj = report_obj
+
+def run_job(report_name, parameters):
+    """
+        Runs one report in a worker process and returns its data
+    """
+    return report_api.run_report(_report_obj, report_name, **parameters)
+
+def get_request_key(report_name, parameters):
+    """
+        Returns the key identifying a report request, the same for the same report and parameters in any order
+        Parameters without a value are left out like run_report does
+    """
+    return (report_name, tuple(sorted((name, value) for name, value in parameters.items() if value is not None)))
+
+def get_report_requests(report_obj):
+    """
+        Yields a (report name, parameters) tuple for every report and every parameter choice
+        e.g. the best products of every product group
+        Reports requiring a parameter without choices (dates, scenario files) are skipped
+    """
+    choices = report_renderer.get_parameter_choices(report_obj)
+    for report_name, (method_name, fixed_parameters, required_parameters) in report_obj._reports.items():
+        if not set(required_parameters).issubset(choices):
+            continue
+        for values in itertools.product(*[choices[name] for name in required_parameters]):
+            yield (report_name, dict(zip(required_parameters, values)))
+
+def get_output_name(report_name, parameters):
+    """
+        Returns a file name (without extension) safe on every platform e.g. best-products-BREAD-10
+    """
+    return re.sub(r'[^\w.-]+', '_', '-'.join([report_name] + [str(value) for value in parameters.values()]))
+
+async def iterate(requests):
+    """
+        Yields the items of an iterable or an async iterable
+    """
+    if hasattr(requests, '__aiter__'):
+        async for request in requests:
+            yield request
+    else:
+        for request in requests:
+            yield request
+
+class Report_Executor(object):
+    """
+        Runs the reports of a DaySell or Product_Sales_Details object from asyncio code in a bounded pool
+            result = await executor.run('best-products', product_group = 'BREAD', products_required = 5)
+            async for report_name, parameters, result, error in executor.stream(requests): ...
+        Identical requests in flight share one run, and at most max_pending reports are queued or running,
+        so a flood of requests waits for free slots instead of filling the memory with queued work and results
+        Only the report data is returned, charts are not drawn (see Agata_Report_Renderer)
+    """
+
+    def __init__(self, report_obj, workers = None, max_pending = None, use_processes = True):
+        """
+            Class Initialization
+            :report_obj: DaySell or Product_Sales_Details object with its data loaded
+            :workers: Number of worker processes or threads, one per CPU if omitted
+            :max_pending: Maximum number of reports queued or running, 4 per worker if omitted
+            :use_processes: False to run the reports in threads of this process, sharing its memoized results
+        """
+        self.report_obj = report_obj
+        self.workers = workers or os.cpu_count() or 1
+        self.max_pending = max_pending or self.workers * _pending_per_worker
+        self.use_processes = use_processes
+        if use_processes:
+            self.pool = ProcessPoolExecutor(max_workers = self.workers, initializer = init_worker, initargs = (report_obj,))
+        else:
+            self.pool = ThreadPoolExecutor(max_workers = self.workers)
+        self.slots = None
+        self.in_flight = {}
+        self.deduplicated = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """
+            Stops the workers, reports not started yet are cancelled
+        """
+        self.pool.shutdown(wait = True, cancel_futures = True)
+
+    def get_slots(self):
+        """
+            Returns the semaphore bounding the reports queued or running, created in the running event loop
+        """
+        if self.slots is None:
+            self.slots = asyncio.Semaphore(self.max_pending)
+        return self.slots
+
+    async def execute(self, report_name, parameters):
+        """
+            Runs one report in the pool once a slot is free
+        """
+        async with self.get_slots():
+            loop = asyncio.get_running_loop()
+            if self.use_processes:
+                return await loop.run_in_executor(self.pool, run_job, report_name, parameters)
+            return await loop.run_in_executor(self.pool, functools.partial(report_api.run_report, self.report_obj, report_name, **parameters))
+
+    async def run(self, report_name, **parameters):
+        """
+            Returns the data of a report, waiting for the run of an identical request when one is in flight
+            Raises the error of the report e.g. ValueError when a required parameter is missing
+        """
+        parameters.pop('type_of_plot', None)
+        key = get_request_key(report_name, parameters)
+        task = self.in_flight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self.execute(report_name, parameters))
+            self.in_flight[key] = task
+            task.add_done_callback(lambda done_task: self.in_flight.pop(key, None))
+        else:
+            self.deduplicated += 1
+
+        # A cancelled caller does not cancel the run shared with the other callers
+        return await asyncio.shield(task)
+
+    async def run_request(self, report_name, parameters):
+        """
+            Returns a tuple (report name, parameters, data, error message or None)
+            Any error of the report is returned with its request, so one failing report does not stop the others
+        """
+        try:
+            return (report_name, parameters, await self.run(report_name, **parameters), None)
+        except Exception as error:
+            return (report_name, parameters, None, f'{type(error).__name__}: {error}')
+
+    async def stream(self, requests):
+        """
+            Yields a tuple (report name, parameters, data, error message or None) for every request as soon as it finishes
+            :requests: Iterable or async iterable of (report name, parameters) tuples, read only as slots free up
+        """
+        pending = set()
+        async for report_name, parameters in iterate(requests):
+            pending.add(asyncio.ensure_future(self.run_request(report_name, parameters)))
+
+            # Step: Read the next request only once a slot is free
+            while len(pending) >= self.max_pending:
+                done, pending = await asyncio.wait(pending, return_when = asyncio.FIRST_COMPLETED)
+                for task in done:
+                    yield task.result()
+
+        # Step: Drain the requests still running
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when = asyncio.FIRST_COMPLETED)
+            for task in done:
+                yield task.result()
+
+async def run_all_reports(report_obj, output_directory = None, workers = None, max_pending = None, use_processes = True):
+    """
+        Runs every report for every parameter choice and writes each one as soon as it finishes
+        Returns the number of failed reports
+    """
+    start_time = time.perf_counter()
+    finished = failed = 0
+    with Report_Executor(report_obj, workers, max_pending, use_processes) as executor:
+        async for report_name, parameters, data, error in executor.stream(get_report_requests(report_obj)):
+            finished += 1
+            if error is not None:
+                print(f'{get_output_name(report_name, parameters)}: {error}')
+                failed += 1
+            elif output_directory is not None:
+                report_api.write_report(get_output_name(report_name, parameters), data, output_directory)
+
+    elapsed = time.perf_counter() - start_time
+    pool = 'processes' if use_processes else 'threads'
+    print(f'Ran {finished - failed} of {finished} reports in {elapsed:.2f}s using {executor.workers} worker {pool} and at most {executor.max_pending} pending reports')
+    return failed
+
+def main():
+    parser = argparse.ArgumentParser(description='Run every Agata Retail report concurrently')
+    parser.add_argument('dataset', choices=report_server._datasets, help='Dataset to run the reports of')
+    parser.add_argument('--output-dir', default=None, help='Directory to write the report data to as each report finishes')
+    parser.add_argument('--workers', type=int, default=None, help='Number of worker processes (or threads), one per CPU if omitted')
+    parser.add_argument('--max-pending', type=int, default=None, help='Maximum number of reports queued or running, 4 per worker if omitted')
+    parser.add_argument('--threads', action='store_true', help='Run the reports in threads instead of processes')
+    parser.add_argument('--raw', action='store_true', help='Read the original semi-colon delimited exports directly')
+    parser.add_argument('--no-cache', action='store_true', help='Prepare the data from the csv files instead of the cache')
+    parser.add_argument('--out-of-core', action='store_true', help='Keep only the aggregates of the product sales in memory')
+    args = parser.parse_args()
+
+    report_obj = report_server.load_report_objs([args.dataset], args.raw, not args.no_cache, args.out_of_core)[args.dataset]
+    return asyncio.run(run_all_reports(report_obj, args.output_dir, args.workers, args.max_pending, not args.threads))
+
+if __name__ == '__main__':
+    sys.exit(main())
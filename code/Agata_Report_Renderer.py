@@ -0,0 +1,127 @@
+# Dependencies
+import inspect
+import itertools
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import Agata_Report_Api as report_api
+
+# Constants
+_backend = 'Agg'
+_image_formats = ['png', 'svg']
+_products_required = 10
+
+# Object the reports of a worker process are rendered from, set once per worker
+_report_obj = None
+
+def get_parameter_choices(report_obj):
+    """
+        Returns the values each report parameter is rendered with i.e. parameter: list of values
+        Reports requiring a parameter without choices (dates) are not rendered
+    """
+    choices = {'products_required': [_products_required]}
+    if hasattr(report_obj, 'get_product_groups'):
+        choices['product_group'] = report_obj.get_product_groups()
+        choices['resample_option'] = [report_obj._resample_month]
+    if hasattr(report_obj, '_measures'):
+        choices['col_name'] = report_obj._measures
+    return choices
+
+def get_plot_types(report_obj):
+    """
+        Returns every plot type supported by the object
+    """
+    return [report_obj._line_plot, report_obj._rel_plot, report_obj._box_plot, report_obj._bar_plot]
+
+def get_file_name(report_name, parameters, type_of_plot, image_format):
+    """
+        Returns a file name safe on every platform e.g. best-products-BREAD-10-bar.png
+    """
+    parts = [report_name] + [str(value) for value in parameters.values()] + [type_of_plot]
+    return re.sub(r'[^\w.-]+', '_', '-'.join(parts)) + '.' + image_format
+
+def get_render_jobs(report_obj, output_directory, plot_types = None, image_format = _image_formats[0]):
+    """
+        Returns a list of (report name, parameters, type of plot, file path), one per chart
+        i.e. every report x every parameter choice x every plot type
+    """
+    choices = get_parameter_choices(report_obj)
+    plot_types = plot_types or get_plot_types(report_obj)
+    jobs = []
+    for report_name, (method_name, fixed_parameters, required_parameters) in report_obj._reports.items():
+        # Skip reports without a chart (predictions, backtests) or with parameters without choices
+        if 'type_of_plot' not in inspect.signature(getattr(report_obj, method_name)).parameters:
+            continue
+        if not set(required_parameters).issubset(choices):
+            continue
+        for values in itertools.product(*[choices[name] for name in required_parameters]):
+            parameters = dict(zip(required_parameters, values))
+            for type_of_plot in plot_types:
+                file_path = os.path.join(output_directory, get_file_name(report_name, parameters, type_of_plot, image_format))
+                jobs.append((report_name, parameters, type_of_plot, file_path))
+    return jobs
+
+def init_worker(report_obj):
+    """
+        Keeps the loaded object for the jobs of this process and selects the non-interactive backend
+        With the default fork start method on Linux the object is shared with the parent, not copied upfront
+    """
+    from matplotlib import pyplot as plt
+
+    global _report_obj
+    _report_obj = report_obj
+    plt.switch_backend(_backend)
+
+def render_job(job):
+    """
+        Renders one chart to its file
+        Returns a tuple (file path, error message or None)
+    """
+    report_name, parameters, type_of_plot, file_path = job
+    _report_obj.figure_path = file_path
+    try:
+        report_api.run_report(_report_obj, report_name, type_of_plot = type_of_plot, **parameters)
+        return (file_path, None)
+    except (ValueError, KeyError, TypeError) as error:
+        from matplotlib import pyplot as plt
+        plt.close('all')
+        return (file_path, f'{type(error).__name__}: {error}')
+    finally:
+        _report_obj.figure_path = None
+
+def render_reports(report_obj, output_directory, plot_types = None, image_format = _image_formats[0], workers = None):
+    """
+        Renders every chart of the object to output_directory
+        The jobs are spread across a pool of worker processes sharing the loaded data,
+        workers = 1 renders in this process
+        Returns the number of failed charts
+    """
+    os.makedirs(output_directory, exist_ok = True)
+    jobs = get_render_jobs(report_obj, output_directory, plot_types, image_format)
+    workers = workers or os.cpu_count() or 1
+    start_time = time.perf_counter()
+
+    if workers == 1:
+        init_worker(report_obj)
+        results = [render_job(job) for job in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers = workers, initializer = init_worker, initargs = (report_obj,)) as executor:
+            results = [future.result() for future in as_completed([executor.submit(render_job, job) for job in jobs])]
+
+    failed = [(file_path, error) for file_path, error in results if error is not None]
+    for file_path, error in failed:
+        print(f'{os.path.basename(file_path)}: {error}')
+
+    elapsed = time.perf_counter() - start_time
+    print(f'Rendered {len(results) - len(failed)} of {len(jobs)} charts to {output_directory} in {elapsed:.2f}s using {workers} worker(s)')
+    return len(failed)
+
+def add_render_arguments(parser):
+    """
+        Adds the batch rendering options to an argparse parser
+    """
+    parser.add_argument('--render-dir', default = None, help = 'Render every chart to this directory instead of running the menu')
+    parser.add_argument('--format', default = _image_formats[0], choices = _image_formats, help = 'Image format of the rendered charts')
+    parser.add_argument('--plot-types', nargs = '+', default = None, help = 'Plot types to render, all if omitted')
+    parser.add_argument('--render-workers', type = int, default = None, help = 'Number of rendering processes, one per CPU if omitted')
@@ -0,0 +1,260 @@
+# Dependencies
+import argparse
+import io
+import json
+import os
+import statistics
+import sys
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlsplit
+import pandas as pd
+import Agata_Forecast as forecasting
+import Agata_Report_Api as report_api
+import Agata_Report_Renderer as report_renderer
+
+# Constants
+_host = '127.0.0.1'
+_port = 8050
+_json = 'json'
+_png = 'png'
+_latency_window = 1000
+_errors = 'errors'
+_day_sell = 'day-sell'
+_product_sales = 'product-sales'
+_datasets = [_day_sell, _product_sales]
+
+# Parameters a request may set besides the required parameters of its report
+_request_parameters = ['products_required', 'format', 'type_of_plot', 'horizon', 'model']
+
+# Largest number of days a request may forecast
+_max_horizon = 28
+
+# Parameters set by the server: reports run in the request threads and must not fork worker processes there,
+# a fork while another thread holds a lock (e.g. a build_lock) can deadlock the child
+_server_parameters = {'workers': 1}
+
+# Parameters naming files on the server, reports requiring them are not served
+_file_parameters = ['scenarios', 'output_path']
+
+class Report_Server(ThreadingHTTPServer):
+    """
+        Long running HTTP server answering report queries from the data loaded once at start up
+        Every request runs in its own thread on the shared DaySell / Product_Sales_Details objects,
+        so the prepared data, the rollups and the memoized results are shared by all the clients
+            GET /reports                          reports of every dataset and the parameters they need
+            GET /<dataset>/<report>?name=value    report data as JSON, or as a PNG chart with format=png
+            GET /stats                            latency of the requests per report
+        Threading: the report objects are shared by the request threads and only read by the reports,
+        their lazily built rollups, derived measures and models are guarded by the object's build_lock,
+        the memoized results by the lock of its Report_Cache. Data is not appended while serving.
+        Charts are drawn one at a time as pyplot is not thread safe, data requests run concurrently
+        Requests may only set the parameters of get_allowed_parameters, so clients cannot name files or worker counts,
+        and the backtests and demand forecasts run in the request thread (_server_parameters)
+    """
+
+    daemon_threads = True
+
+    def __init__(self, address, report_objs):
+        """
+            Class Initialization
+            :address: (host, port) to listen on
+            :report_objs: Dictionary i.e. dataset name: DaySell or Product_Sales_Details object
+        """
+        super().__init__(address, Report_Request_Handler)
+        self.report_objs = report_objs
+        self.render_lock = threading.Lock()
+        self.latency_lock = threading.Lock()
+        self.latencies = {}
+
+    def get_catalog(self):
+        """
+            Returns the reports of every dataset with their required parameters
+        """
+        return {dataset: {report_name: required_parameters for report_name, (method_name, fixed_parameters, required_parameters) in report_obj._reports.items()
+                          if not set(required_parameters).intersection(_file_parameters)}
+                for dataset, report_obj in self.report_objs.items()}
+
+    def get_allowed_parameters(self, report_obj, report_name):
+        """
+            Returns the parameters a request of the report may set i.e. its required parameters and _request_parameters
+            Raises ValueError for an unknown report or a report requiring a file on the server
+        """
+        if report_name not in report_obj._reports:
+            raise ValueError(f'Unknown report {report_name}, see /reports')
+        method_name, fixed_parameters, required_parameters = report_obj._reports[report_name]
+        if set(required_parameters).intersection(_file_parameters):
+            raise ValueError(f'Report {report_name} reads files on the server and is not served')
+        return set(required_parameters).union(_request_parameters)
+
+    def check_parameters(self, parameters):
+        """
+            Raises ValueError for a forecast horizon out of range or an unknown forecast model
+        """
+        if 'horizon' in parameters and not 1 <= parameters['horizon'] <= _max_horizon:
+            raise ValueError(f'horizon must be from 1 to {_max_horizon} days')
+        if 'model' in parameters and parameters['model'] not in forecasting._models:
+            raise ValueError(f'Unknown model {parameters["model"]}, use {", ".join(forecasting._models)}')
+
+    def get_parameters(self, query):
+        """
+            Returns the report parameters of a query string, numbers converted like the command line options
+        """
+        parameters = dict(parse_qsl(query))
+        for name, convert in report_api._numeric_parameters.items():
+            if name in parameters:
+                parameters[name] = convert(parameters[name])
+        return parameters
+
+    def run(self, dataset, report_name, parameters):
+        """
+            Runs a report and returns a tuple (content type, body)
+            Raises KeyError for an unknown dataset and ValueError for invalid parameters
+        """
+        report_obj = self.report_objs[dataset]
+        not_allowed = set(parameters).difference(self.get_allowed_parameters(report_obj, report_name))
+        if not_allowed:
+            raise ValueError(f'Report {report_name} does not take {", ".join(sorted(not_allowed))}')
+        self.check_parameters(parameters)
+        parameters.update(_server_parameters)
+        image_format = parameters.pop('format', _json)
+        if image_format == _json:
+            parameters.pop('type_of_plot', None)
+            return ('application/json', encode_report(report_api.run_report(report_obj, report_name, **parameters)))
+        if image_format != _png:
+            raise ValueError(f'Unknown format {image_format}, use {_json} or {_png}')
+
+        parameters.setdefault('type_of_plot', report_obj._bar_plot)
+        buffer = io.BytesIO()
+        with self.render_lock:
+            report_obj.figure_path = buffer
+            try:
+                report_api.run_report(report_obj, report_name, **parameters)
+            finally:
+                report_obj.figure_path = None
+        if buffer.tell() == 0:
+            raise ValueError(f'Report {report_name} has no chart')
+        return ('image/png', buffer.getvalue())
+
+    def record_latency(self, key, milliseconds):
+        """
+            Keeps the latency of the last requests of a report
+        """
+        with self.latency_lock:
+            self.latencies.setdefault(key, deque(maxlen = _latency_window)).append(milliseconds)
+
+    def get_stats(self):
+        """
+            Returns the count, mean, median, 95th percentile and maximum latency in milliseconds of every report
+        """
+        with self.latency_lock:
+            latencies = {key: list(values) for key, values in self.latencies.items()}
+        stats = {}
+        for key, values in sorted(latencies.items()):
+            values.sort()
+            stats[key] = {'Requests': len(values), 'Mean': statistics.fmean(values), 'Median': statistics.median(values),
+                          '95th Percentile': values[min(len(values) - 1, int(0.95 * len(values)))], 'Max': values[-1]}
+        return stats
+
+class Report_Request_Handler(BaseHTTPRequestHandler):
+    """
+        Answers one HTTP request of the report server
+    """
+
+    def do_GET(self):
+        start_time = time.perf_counter()
+        url = urlsplit(self.path)
+        parts = [part for part in url.path.split('/') if part]
+        key = '/'.join(parts) or '/'
+        try:
+            if parts in ([], ['reports']):
+                status, content_type, body = 200, 'application/json', json.dumps(self.server.get_catalog()).encode()
+            elif parts == ['stats']:
+                status, content_type, body = 200, 'application/json', json.dumps(self.server.get_stats()).encode()
+            elif len(parts) == 2 and parts[0] in self.server.report_objs:
+                content_type, body = self.server.run(parts[0], parts[1], self.server.get_parameters(url.query))
+                status = 200
+            else:
+                status, content_type, body = 404, 'application/json', json.dumps({'error': f'Unknown path {url.path}, see /reports'}).encode()
+        except (ValueError, KeyError, TypeError, EOFError) as error:
+            status, content_type, body = 400, 'application/json', json.dumps({'error': str(error)}).encode()
+        except Exception as error:
+            status, content_type, body = 500, 'application/json', json.dumps({'error': repr(error)}).encode()
+
+        # Failed requests share one key so unknown paths cannot add keys without end
+        milliseconds = (time.perf_counter() - start_time) * 1000
+        self.server.record_latency(key if status == 200 else _errors, milliseconds)
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('X-Elapsed-Ms', f'{milliseconds:.2f}')
+        self.end_headers()
+        self.wfile.write(body)
+        self.log_message('"%s" %d %.1f ms', self.requestline, status, milliseconds)
+
+    def log_request(self, code = '-', size = '-'):
+        """
+            Logged with the latency in do_GET instead
+        """
+
+def encode_report(data):
+    """
+        Returns the data of a report as JSON i.e. predictions as an object, tables as a list of rows
+        Named indexes (dates, days of the week, ...) become columns of the rows, row numbers are dropped
+    """
+    if isinstance(data, dict):
+        return json.dumps(data, default = float).encode()
+    frame = pd.DataFrame(data)
+    frame = frame.reset_index(drop = all(name is None for name in frame.index.names))
+    return frame.to_json(orient = 'records', date_format = 'iso').encode()
+
+def load_report_objs(datasets, raw_export = False, use_cache = True, out_of_core = False, dataset_options = None):
+    """
+        Loads the data of every dataset once i.e. dataset name: report object
+    """
+    # Imported here so the server module stays importable without loading the analysis modules
+    from Agata_Day_Sell import DaySell
+    from Agata_Product_Sales import Product_Sales_Details
+
+    report_objs = {}
+    for dataset in datasets:
+        start_time = time.perf_counter()
+        if dataset == _day_sell:
+            report_objs[dataset] = DaySell(raw_export, use_cache, **(dataset_options or {}))
+        else:
+            report_objs[dataset] = Product_Sales_Details(raw_export, use_cache, out_of_core, **(dataset_options or {}))
+        print(f'{dataset} loaded in {time.perf_counter() - start_time:.2f}s')
+    return report_objs
+
+def main():
+    parser = argparse.ArgumentParser(description='Agata Retail Report Server')
+    parser.add_argument('--host', default=_host, help='Address to listen on, local only by default')
+    parser.add_argument('--port', type=int, default=_port, help='Port to listen on')
+    parser.add_argument('--datasets', nargs='+', choices=_datasets, default=_datasets, help='Datasets to load and serve')
+    parser.add_argument('--raw', action='store_true', help='Read the original semi-colon delimited exports directly')
+    parser.add_argument('--no-cache', action='store_true', help='Prepare the data from the csv files instead of the cache')
+    parser.add_argument('--out-of-core', action='store_true', help='Keep only the aggregates of the product sales in memory')
+    parser.add_argument('--partitions', help='Directory of the partitioned datasets to read instead of the csv files')
+    parser.add_argument('--store', nargs='+', help='Stores read from the partitioned datasets, all if omitted')
+    parser.add_argument('--year', help='Year of the yearly reports, the latest year of the data if omitted')
+    args = parser.parse_args()
+
+    # Charts are rendered off screen, and a report never waits for a prompt
+    os.environ.setdefault('MPLBACKEND', report_renderer._backend)
+    sys.stdin = io.StringIO()
+
+    report_objs = load_report_objs(args.datasets, args.raw, not args.no_cache, args.out_of_core,
+                                   {'partition_root': args.partitions, 'stores': args.store, 'data_year': args.year})
+    server = Report_Server((args.host, args.port), report_objs)
+    print(f'Serving {", ".join(report_objs)} on http://{args.host}:{server.server_port}/reports')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+if __name__ == '__main__':
+    main()
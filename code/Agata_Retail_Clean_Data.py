@@ -1,4 +1,41 @@
+# Dependencies
+import argparse
+import fnmatch
+import glob
+import hashlib
+import json
+import os
+import re
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
 class Clean_Data(object):
+
+    # Commas become decimal points and semi-colons become commas
+    # Commas left in a semi-colon delimited file with decimal points (e.g. in a product name) become points too,
+    # so they never turn into extra fields
+    _translation_table = bytes.maketrans(b',;', b'.,')
+
+    # Dialects i.e. Raw Agata export (source) and converted file (target)
+    _source_delimiter = ';'
+    _target_delimiter = ','
+    _decimal_comma = ','
+    _decimal_point = '.'
+    _sample_size = 64 * 1024
+    _decimal_comma_pattern = re.compile(rb'\d,\d')
+
+    # Batch mode
+    _batch_patterns = ['SELL_*.csv', 'Day_sell_*.csv']
+    # Rows appended to the data (see Agata_Append_Data), read with the data file in its dialect
+    _appended_pattern = '*.appended.csv'
+    _manifest_name = '.agata_clean_manifest.json'
+    _converted = 'converted'
+    _skipped = 'skipped'
+    _already_clean = 'clean'
+    _failed = 'failed'
+
     def __init__(self):
         """ 
             Class initialization
@@ -6,6 +43,7 @@ class Clean_Data(object):
         """
         self.parent_directory = "..\csv\\"
         self.file_parse_error_msg = "An error occurred while paring the file"
+        self.chunk_size = 1024 * 1024
 
     def update_file(self, file_name):
         """
@@ -14,7 +52,9 @@ class Clean_Data(object):
                 a. Commas with blankspaces
                 b. Semi-Colons with Commas
             
-            Updates the files with above changes
+            Streams the file in fixed size chunks into a temporary file
+            in the same directory and then atomically replaces the original,
+            so memory stays flat and a failure never leaves a half written file
 
             Returns a boolean value
                 True: File updated succesfully
@@ -23,24 +63,109 @@ class Clean_Data(object):
             Note: Please change the parent directory accordingly
         """
         try:
-            new_str = ""
-            success = True
-            with open(self.parent_directory + file_name, mode='r') as file_data:
-                for line in file_data:
-                    line = line.replace(",", ".")
-                    line = line.replace(";",",")
-                    new_str += line
-            
-            with open(self.parent_directory + file_name, mode='w') as file_data:
-                file_data.write(new_str)
-            return success
-        except:
+            if self.convert_file(self.parent_directory + file_name) == 0:
+                print(f'File {file_name} is already converted')
+            return True
+        except (OSError, ValueError):
             print(self.file_parse_error_msg)
-            success = False
-        finally:
-            if file_data != None:
-                file_data.close()
-            return success
+            return False
+
+    def sniff_dialect(self, file_path):
+        """
+            :parameters: path of the file. datatype = string
+            Sniffs the delimiter and decimal mark from a small sample
+            at the start of the file, without reading the rest of it
+
+            Returns a tuple (delimiter, decimal mark)
+            Raises ValueError if the delimiter cannot be recognised
+        """
+        with open(file_path, mode='rb') as file_data:
+            sample = file_data.read(self._sample_size)
+
+        lines = sample.splitlines()
+        if not lines:
+            raise ValueError(f'{file_path} is empty')
+
+        # The header only contains column names, so the delimiter is unambiguous there
+        header = lines[0]
+        if header.count(b';') > header.count(b','):
+            delimiter = self._source_delimiter
+        elif header.count(b',') > 0:
+            delimiter = self._target_delimiter
+        else:
+            raise ValueError(f'Unknown delimiter in {file_path}')
+
+        # The last line of a full sample may be cut short
+        data_lines = lines[1:-1] if len(sample) == self._sample_size else lines[1:]
+
+        # In a comma delimited file a comma between digits is usually a field boundary,
+        # decimal commas show as most rows having more fields than the header
+        decimal = self._decimal_point
+        if delimiter == self._source_delimiter:
+            for line in data_lines:
+                if self._decimal_comma_pattern.search(line):
+                    decimal = self._decimal_comma
+                    break
+        elif data_lines:
+            longer_lines = sum(line.count(b',') > header.count(b',') and self._decimal_comma_pattern.search(line) is not None for line in data_lines)
+            if longer_lines > len(data_lines) / 2:
+                decimal = self._decimal_comma
+
+        return (delimiter, decimal)
+
+    def get_translation_table(self, file_path, delimiter, decimal):
+        """
+            :parameters: path, delimiter and decimal mark of the file
+            Returns the byte translation converting the file to the target dialect, None if it is already converted
+            Raises ValueError if the file cannot be converted i.e. decimal commas in a comma delimited file
+        """
+        if delimiter == self._target_delimiter:
+            if decimal == self._decimal_comma:
+                raise ValueError(f'{file_path} is comma delimited with decimal commas, the fields cannot be told apart')
+            return None
+        return self._translation_table
+
+    def convert_file(self, file_path, digest=None):
+        """
+            :parameters: path of the file. datatype = string
+                         hashlib object updated with the converted data (optional)
+            Converts the file chunk by chunk and replaces it atomically
+            Only the delimiter and decimal mark that differ from the target dialect are converted,
+            files already in the target dialect are left untouched
+
+            Returns the number of bytes converted (0 if already converted)
+        """
+        translation_table = self.get_translation_table(file_path, *self.sniff_dialect(file_path))
+        if translation_table is None:
+            return 0
+
+        directory = os.path.dirname(os.path.abspath(file_path))
+        temp_descriptor, temp_path = tempfile.mkstemp(prefix='.', suffix='.tmp', dir=directory)
+        converted_bytes = 0
+        try:
+            with os.fdopen(temp_descriptor, mode='wb') as target, open(file_path, mode='rb') as source:
+                # Single byte translation, equivalent to replacing commas first and then semi-colons
+                chunk = source.read(self.chunk_size)
+                while chunk:
+                    chunk_converted = chunk.translate(translation_table)
+                    target.write(chunk_converted)
+                    if digest is not None:
+                        digest.update(chunk_converted)
+                    converted_bytes += len(chunk)
+                    chunk = source.read(self.chunk_size)
+
+                # Make sure the data is on disk before the rename makes it visible
+                target.flush()
+                os.fsync(target.fileno())
+
+            # Keep the permissions of the original file
+            shutil.copymode(file_path, temp_path)
+            os.replace(temp_path, file_path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        return converted_bytes
 
     def print_data(self, file_name):
         """ 
@@ -62,24 +187,158 @@ class Clean_Data(object):
     def get_filename(self):
         return input('Enter filename: ')
 
-clean_mode = True
-clean_data_object = Clean_Data()
-while clean_mode:
-    print('-'*20)
-    print('Agata_Retail_Data_Clean Utility')
-    print('1. Update file')
-    print('2. Print Contents of the file')
-    print('3. Exit')
-    print('-'*20)
-    choice = input('Enter your choice:')
-
-    if choice == "1":
-        file_name = clean_data_object.get_filename()
-        if clean_data_object.update_file(file_name):
-            print(f'File {file_name} updated successfully')
-    elif choice == "2":
-        clean_data_object.print_data(clean_data_object.get_filename())
-    elif choice == "3":
-        clean_mode = False
+    def file_digest(self, file_path):
+        """
+            :parameters: path of the file. datatype = string
+            Returns the sha256 hex digest of the file, read in chunks
+        """
+        digest = hashlib.sha256()
+        with open(file_path, mode='rb') as file_data:
+            chunk = file_data.read(self.chunk_size)
+            while chunk:
+                digest.update(chunk)
+                chunk = file_data.read(self.chunk_size)
+        return digest.hexdigest()
+
+    def find_files(self, pattern):
+        """
+            :parameters: glob pattern or directory. datatype = string
+            Returns the sorted list of files to convert
+            A directory is searched for SELL_*.csv and Day_sell_*.csv exports
+            Files of appended rows (*.appended.csv) are never converted on their own
+        """
+        if os.path.isdir(pattern):
+            file_paths = []
+            for batch_pattern in self._batch_patterns:
+                file_paths.extend(glob.glob(os.path.join(pattern, batch_pattern)))
+        else:
+            file_paths = glob.glob(pattern)
+        return sorted(set(os.path.abspath(file_path) for file_path in file_paths
+                          if os.path.isfile(file_path) and not fnmatch.fnmatch(os.path.basename(file_path), self._appended_pattern)))
+
+    def read_manifest(self, directory):
+        """
+            Returns the {file name: sha256 of converted content} mapping of a directory
+        """
+        try:
+            with open(os.path.join(directory, self._manifest_name), mode='r') as manifest:
+                return json.load(manifest)
+        except (OSError, ValueError):
+            return {}
+
+    def write_manifest(self, directory, manifest):
+        """
+            Atomically writes the manifest of converted files of a directory
+        """
+        temp_descriptor, temp_path = tempfile.mkstemp(prefix='.', suffix='.tmp', dir=directory)
+        with os.fdopen(temp_descriptor, mode='w') as manifest_file:
+            json.dump(manifest, manifest_file, indent=2, sort_keys=True)
+        os.replace(temp_path, os.path.join(directory, self._manifest_name))
+
+    def batch_convert_file(self, file_path, converted_digest=None):
+        """
+            :parameters: path of the file. datatype = string
+                         digest recorded when the file was last converted (optional)
+            Converts the file unless its dialect or content hash shows it is already converted
+            The dialect is sniffed first from a sample, the whole file is only hashed when it would be converted
+
+            Returns a tuple (file_path, status, size in bytes, seconds, digest)
+        """
+        start = time.perf_counter()
+        size = os.path.getsize(file_path)
+        try:
+            if self.get_translation_table(file_path, *self.sniff_dialect(file_path)) is None:
+                return (file_path, self._already_clean, size, time.perf_counter() - start, None)
+            if converted_digest is not None and self.file_digest(file_path) == converted_digest:
+                return (file_path, self._skipped, size, time.perf_counter() - start, converted_digest)
+            digest = hashlib.sha256()
+            if self.convert_file(file_path, digest) == 0:
+                return (file_path, self._already_clean, size, time.perf_counter() - start, None)
+            return (file_path, self._converted, size, time.perf_counter() - start, digest.hexdigest())
+        except (OSError, ValueError):
+            return (file_path, self._failed, size, time.perf_counter() - start, None)
+
+    def batch_update(self, patterns, workers=None):
+        """
+            :parameters: list of glob patterns or directories. datatype = list
+                         number of worker processes (default: number of CPUs)
+            Converts all matching files in parallel across a process pool
+            Files whose content hash matches the manifest are skipped
+
+            Returns a list of tuples (file_path, status, size in bytes, seconds, digest)
+        """
+        file_paths = []
+        for pattern in patterns:
+            file_paths.extend(self.find_files(pattern))
+        file_paths = sorted(set(file_paths))
+
+        manifests = {}
+        for file_path in file_paths:
+            directory = os.path.dirname(file_path)
+            if directory not in manifests:
+                manifests[directory] = self.read_manifest(directory)
+
+        results = []
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = []
+            for file_path in file_paths:
+                converted_digest = manifests[os.path.dirname(file_path)].get(os.path.basename(file_path))
+                futures.append(executor.submit(self.batch_convert_file, file_path, converted_digest))
+
+            for future in as_completed(futures):
+                file_path, status, size, seconds, digest = future.result()
+                if status == self._converted:
+                    manifests[os.path.dirname(file_path)][os.path.basename(file_path)] = digest
+                self.print_throughput(file_path, status, size, seconds)
+                results.append((file_path, status, size, seconds, digest))
+
+        for directory, manifest in manifests.items():
+            self.write_manifest(directory, manifest)
+        return results
+
+    def print_throughput(self, file_path, status, size, seconds):
+        """
+            Prints the status and throughput of a converted file
+        """
+        megabytes = size / (1024 * 1024)
+        throughput = megabytes / seconds if seconds > 0 else 0
+        print(f'{os.path.basename(file_path)}: {status} {megabytes:.2f} MB in {seconds:.3f}s ({throughput:.1f} MB/s)')
+
+def interactive_menu(clean_data_object):
+    clean_mode = True
+    while clean_mode:
+        print('-'*20)
+        print('Agata_Retail_Data_Clean Utility')
+        print('1. Update file')
+        print('2. Print Contents of the file')
+        print('3. Exit')
+        print('-'*20)
+        choice = input('Enter your choice:')
+
+        if choice == "1":
+            file_name = clean_data_object.get_filename()
+            if clean_data_object.update_file(file_name):
+                print(f'File {file_name} updated successfully')
+        elif choice == "2":
+            clean_data_object.print_data(clean_data_object.get_filename())
+        elif choice == "3":
+            clean_mode = False
+        else:
+            print('Invalid input. Please select from the above options only')
+
+def main():
+    parser = argparse.ArgumentParser(description='Agata_Retail_Data_Clean Utility')
+    parser.add_argument('patterns', nargs='*', help='Files, glob patterns or directories to convert in batch mode')
+    parser.add_argument('--workers', type=int, default=None, help='Number of worker processes')
+    args = parser.parse_args()
+
+    clean_data_object = Clean_Data()
+    if args.patterns:
+        results = clean_data_object.batch_update(args.patterns, args.workers)
+        failed = [result for result in results if result[1] == clean_data_object._failed]
+        print(f'{len(results)} files processed, {len(failed)} failed')
     else:
-        print('Invalid input. Please select from the above options only')
+        interactive_menu(clean_data_object)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+import os
+import stat
+import numpy as np
+import pytest
+import Agata_Append_Data as append_data
+from Agata_Day_Sell import DaySell
+
+_day_sell_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'csv', 'Day_sell_24_12_18.csv')
+
+@pytest.fixture
+def day_sell_files(tmp_path):
+    """
+        Returns a tuple (data file, export of new days): the Day_sell export without its last week, and the last week
+    """
+    with open(_day_sell_path, mode = 'rb') as source:
+        lines = source.read().split(b'\r\n')
+    header, rows = lines[0], [line for line in lines[1:] if line.strip()]
+    history, new_days, totals = rows[:-8], rows[-8:-1], rows[-1]
+    data_path, new_path = tmp_path / 'Day_sell.csv', tmp_path / 'Day_sell_new.csv'
+    data_path.write_bytes(b'\r\n'.join([header] + history + [totals]) + b'\r\n')
+    new_path.write_bytes(b'\r\n'.join([header] + new_days) + b'\r\n')
+    os.chmod(data_path, 0o644)
+    return (str(data_path), str(new_path))
+
+def test_append_leaves_data_file_and_keeps_its_mode(day_sell_files):
+    data_path, new_path = day_sell_files
+    with open(data_path, mode = 'rb') as data_file:
+        data = data_file.read()
+    day_sell = DaySell(data_path = data_path)
+    assert day_sell.append_data(new_path) == 7
+    with open(data_path, mode = 'rb') as data_file:
+        assert data_file.read() == data
+    appended_path = append_data.get_appended_path(data_path)
+    assert stat.S_IMODE(os.stat(appended_path).st_mode) == 0o644
+
+def test_append_stores_new_days_as_a_cache_part(day_sell_files):
+    data_path, new_path = day_sell_files
+    day_sell = DaySell(data_path = data_path)
+    cached_entries = set(os.listdir(day_sell.data_cache.cache_directory))
+    day_sell.append_data(new_path)
+    entries = set(os.listdir(day_sell.data_cache.cache_directory))
+    assert cached_entries.issubset(entries)
+    assert len(entries - cached_entries) == 1
+
+    cached = DaySell(data_path = data_path)
+    not_cached = DaySell(data_path = data_path, use_cache = False)
+    assert cached.all_data.equals(not_cached.all_data)
+    assert cached.all_data.equals(day_sell.all_data)
+
+def test_models_after_append_same_with_and_without_cache(day_sell_files):
+    data_path, new_path = day_sell_files
+    day_sell = DaySell(data_path = data_path)
+    day_sell.get_model(DaySell._tax_model)
+    day_sell.append_data(new_path)
+
+    for use_cache in [True, False]:
+        loaded = DaySell(data_path = data_path, use_cache = use_cache)
+        for name in DaySell._model_columns:
+            simple_regr, accuracy = day_sell.get_model(name)
+            loaded_regr, loaded_accuracy = loaded.get_model(name)
+            assert loaded_accuracy == pytest.approx(accuracy, rel = 1e-9)
+            assert np.allclose(loaded_regr.coef_, simple_regr.coef_, rtol = 1e-9)
+            assert np.allclose(loaded_regr.intercept_, simple_regr.intercept_, rtol = 1e-9)
@@ -0,0 +1,29 @@
+import os
+import pytest
+from Agata_Retail_Clean_Data import Clean_Data
+
+def write_file(path, content):
+    with open(path, mode = 'wb') as target:
+        target.write(content)
+    return str(path)
+
+def test_find_files_skips_appended_rows(tmp_path):
+    for file_name in ['SELL_1.csv', 'SELL_1.appended.csv', 'Day_sell_1.csv', 'Day_sell_1.appended.csv', 'notes.csv']:
+        write_file(tmp_path / file_name, b'Date,zn\r\n')
+    expected = [str(tmp_path / 'Day_sell_1.csv'), str(tmp_path / 'SELL_1.csv')]
+    assert Clean_Data().find_files(str(tmp_path)) == expected
+    assert Clean_Data().find_files(os.path.join(str(tmp_path), '*_1*.csv')) == expected
+
+def test_batch_convert_does_not_hash_converted_files(tmp_path, monkeypatch):
+    file_path = write_file(tmp_path / 'SELL_1.csv', b'Date,zn,sb\r\n24.12.2017,1334.95,1903.82\r\n')
+    clean_data = Clean_Data()
+    monkeypatch.setattr(clean_data, 'file_digest', lambda file_path: pytest.fail('a converted file was hashed'))
+    result = clean_data.batch_convert_file(file_path, 'digest of the converted file')
+    assert result[1] == Clean_Data._already_clean
+
+def test_convert_semicolon_file_with_decimal_points_keeps_the_fields(tmp_path):
+    file_path = write_file(tmp_path / 'SELL_1.csv', b'Date;Pname;zn\r\n01.01.2018;BELLA, 200;1.77\r\n02.01.2018;BREAD;2.57\r\n')
+    assert Clean_Data().convert_file(file_path) > 0
+    with open(file_path, mode = 'rb') as converted:
+        lines = converted.read().splitlines()
+    assert lines == [b'Date,Pname,zn', b'01.01.2018,BELLA. 200,1.77', b'02.01.2018,BREAD,2.57']
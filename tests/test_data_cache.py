@@ -0,0 +1,23 @@
+import os
+import stat
+import pandas as pd
+from Agata_Data_Cache import Data_Cache, get_file_mode
+
+def test_store_removes_older_versions_of_the_tag(tmp_path):
+    source_path = tmp_path / 'SELL_1.csv'
+    source_path.write_bytes(b'Date,zn\r\n01.01.2018,1.77\r\n')
+    frame = pd.DataFrame({'zn': [1.77]})
+    for tag in ['aggregates-v1-clean', 'aggregates-v1-raw', 'aggregates-v2-clean']:
+        assert Data_Cache(str(source_path), tag).store_frame(frame)
+    cache_directory = tmp_path / Data_Cache._cache_directory
+    tags = sorted(file_name.split('.')[2] for file_name in os.listdir(cache_directory))
+    assert tags == ['aggregates-v1-raw', 'aggregates-v2-clean']
+
+def test_entries_have_the_permissions_of_new_files(tmp_path):
+    source_path = tmp_path / 'Day_sell.csv'
+    source_path.write_bytes(b'Date,zn\r\n01.01.2018,1.77\r\n')
+    data_cache = Data_Cache(str(source_path), 'models-v3-clean')
+    assert data_cache.store_object({'model': 1})
+    for file_name in os.listdir(data_cache.cache_directory):
+        assert stat.S_IMODE(os.stat(os.path.join(data_cache.cache_directory, file_name)).st_mode) == get_file_mode()
+    assert data_cache.load_object() == {'model': 1}
@@ -0,0 +1,28 @@
+import numpy as np
+import pandas as pd
+import pytest
+import Agata_Forecast as forecasting
+
+def get_series(closed_days = ()):
+    """
+        Daily sales with a weekly pattern on a calendar index, closed days are NaN like get_daily_series
+    """
+    dates = pd.date_range('2018-01-01', periods = 140, freq = 'D')
+    values = 1000 + 300 * np.sin(2 * np.pi * dates.dayofweek / 7) + np.random.default_rng(2).normal(0, 50, len(dates))
+    series = pd.Series(values, index = dates, name = 'Net Sales')
+    series[pd.DatetimeIndex(closed_days)] = np.nan
+    return series
+
+@pytest.mark.parametrize('model', forecasting._models)
+def test_forecast_with_closed_days_in_window(model):
+    series = get_series(['2018-05-15', '2018-05-16'])
+    forecast = forecasting.forecast(series.loc[:'2018-05-18'], model, 3)
+    assert len(forecast) == 3
+    assert forecast.notna().all()
+    assert forecast.between(series.min() / 2, series.max() * 2).all()
+
+def test_forecast_without_data_raises():
+    series = get_series()
+    series[:] = np.nan
+    with pytest.raises(ValueError):
+        forecasting.forecast(series, forecasting._seasonal_naive, 3)